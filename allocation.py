@@ -0,0 +1,396 @@
+import heapq
+from bisect import bisect_left
+import numbers
+import re
+
+import numpy as np
+import pandas as pd
+
+from workbook import TASK_DAYS
+
+# Function codes from most to least senior, matching canEmployeePerformTask in the page
+FUNCTION_CODES = ['CC', 'TL', 'DC', 'A', 'B', 'C', 'D', 'E+', 'E']
+FUNCTION_RANKS = {code: rank for rank, code in enumerate(FUNCTION_CODES, start=1)}
+
+# Shifts and tasks starting before 05:00 belong to the night of their day, like the Nacht dagdeel and period
+DAY_START_MINUTES = 300
+MINUTES_PER_DAY = 24 * 60
+
+ASSIGNMENT_COLUMNS = ['Medewerkers', 'Datum', 'TaskId', 'Locatie', 'Dagdeel']
+
+
+# Function to get the function rank (1 = CC ... 9 = E) from an employee function like '4. WH Agent A'
+def employee_function_rank(function):
+    match = re.match(r'^(\d+)\.', str(function))
+    if not match:
+        return None
+    rank = int(match.group(1))
+    return rank if rank in range(1, len(FUNCTION_CODES) + 1) else None
+
+
+# Function to get the bitmask of task function codes an employee function can perform
+def function_capability_mask(function):
+    rank = employee_function_rank(function)
+    if rank is None:
+        return 0
+    # One bit per function code, an employee covers its own rank and every rank below it
+    return ((1 << len(FUNCTION_CODES)) - 1) & ~((1 << (rank - 1)) - 1)
+
+
+# Function to get the bit of a task function code
+def task_function_bit(function):
+    rank = FUNCTION_RANKS.get(function)
+    return 1 << (rank - 1) if rank else 0
+
+
+# Function to build the employee function x task function eligibility index for the page
+def build_eligibility_index(employees_df, tasks_df):
+    employee_functions = employees_df['Functie'].dropna().unique() if not employees_df.empty else []
+    task_functions = tasks_df['Function'].dropna().unique() if not tasks_df.empty else []
+    return {
+        'employeeMasks': {str(function): function_capability_mask(function) for function in employee_functions},
+        'taskBits': {str(function): task_function_bit(function) for function in task_functions},
+    }
+
+
+# Function to convert 'HH:MM' to minutes after midnight, minutes are passed through
+def time_to_minutes(value):
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    try:
+        hour, minute = str(value).split(':')[:2]
+        return int(hour) * 60 + int(minute)
+    except (ValueError, AttributeError):
+        return None
+
+
+# Function to place a start and end in minutes on their day, moving night starts and overnight (+1) ends
+# to the next day, shared by shifts and tasks so both follow DAY_START_MINUTES
+def day_window(start, end):
+    if start is None or end is None:
+        return None
+    if start < DAY_START_MINUTES:
+        start += MINUTES_PER_DAY
+        end += MINUTES_PER_DAY
+    if end <= start:
+        end += MINUTES_PER_DAY
+    return start, end
+
+
+# Function to get the shift window in minutes, moving night shifts and overnight (+1) ends to the next day
+def shift_window(start_time, end_time):
+    return day_window(time_to_minutes(start_time), time_to_minutes(end_time))
+
+
+# Function to get the task window in minutes from a 'HH:MM - HH:MM' time
+def task_window(time_range):
+    if not time_range or pd.isna(time_range) or ' - ' not in str(time_range):
+        return None
+    start_time, end_time = str(time_range).split(' - ', 1)
+    return day_window(time_to_minutes(start_time), time_to_minutes(end_time))
+
+
+# Function to check whether start-end overlaps one of the sorted, disjoint busy intervals
+def overlaps_busy(busy, start, end):
+    starts, ends = busy
+    position = bisect_left(starts, end)
+    return position > 0 and ends[position - 1] > start
+
+
+# Function to allocate the tasks of one date to the shifts of that date
+def allocate_day(shifts, tasks):
+    """Greedy sweep over tasks in start order.
+
+    Shifts enter the active set once they have started and leave it through a
+    heap on their end time, so each task only looks at the shifts running at
+    its start. Among the employees that can take the task, the least senior
+    one wins, then the one with the fewest tasks so far. A shift may carry
+    'busy' (starts, ends) of tasks it already holds, those times stay blocked.
+    """
+    shifts = sorted(shifts, key=lambda shift: shift['start'])
+    tasks = sorted(tasks, key=lambda task: (task['start'], task['rank'], task['end']))
+
+    active = {}
+    ending = []
+    next_shift = 0
+    assignments = []
+
+    for task in tasks:
+        while next_shift < len(shifts) and shifts[next_shift]['start'] <= task['start']:
+            shift = shifts[next_shift]
+            active[next_shift] = shift
+            heapq.heappush(ending, (shift['end'], next_shift))
+            next_shift += 1
+
+        # Tasks come in start order, so a shift that ends before this task starts is done
+        while ending and ending[0][0] <= task['start']:
+            _, shift_id = heapq.heappop(ending)
+            del active[shift_id]
+
+        best = None
+        best_key = None
+        for shift in active.values():
+            if shift['end'] < task['end'] or shift['free_at'] > task['start']:
+                continue
+            if not shift['mask'] & task['bit']:
+                continue
+            if task['location'] and shift['location'] != task['location']:
+                continue
+            busy = shift.get('busy')
+            if busy and overlaps_busy(busy, task['start'], task['end']):
+                continue
+            key = (-shift['rank'], shift['load'], shift['start'])
+            if best_key is None or key < best_key:
+                best, best_key = shift, key
+
+        if best is not None:
+            best['free_at'] = task['end']
+            best['load'] += 1
+            assignments.append({
+                'Medewerkers': best['employee'],
+                'Datum': best['date'],
+                'TaskId': task['task_id'],
+                'Locatie': best['location'],
+                'Dagdeel': task['dagdeel'],
+            })
+
+    return assignments
+
+
+# Function to turn the timed tasks with a known function into allocation records, grouped by Day
+def task_records(tasks_df):
+    tasks_by_day = {}
+    for task in tasks_df.itertuples(index=False):
+        window = task_window(task.Time)
+        task_rank = task.FunctionRank
+        if window is None or pd.isna(task_rank):
+            continue
+        tasks_by_day.setdefault(task.Day, []).append({
+            'start': window[0],
+            'end': window[1],
+            'rank': int(task_rank),
+            'bit': task_function_bit(task.Function),
+            'location': task.Locatie if isinstance(task.Locatie, str) else '',
+            'task_id': task.TaskId,
+            'dagdeel': task.Dagdeel,
+        })
+    return tasks_by_day
+
+
+# Function to turn the timed shifts of non-trainees into allocation records, grouped by Datum
+def shift_records(employees_df):
+    shifts_by_date = {}
+    for shift in employees_df.itertuples(index=False):
+        window = shift_window(shift.Starttijd, shift.Eindtijd)
+        employee_rank = shift.FunctionRank
+        if window is None or pd.isna(employee_rank) or shift.IsTrainee:
+            continue
+        shifts_by_date.setdefault(shift.Datum, []).append({
+            'start': window[0],
+            'end': window[1],
+            'rank': int(employee_rank),
+            'mask': function_capability_mask(shift.Functie),
+            'location': shift.Locatie,
+            'employee': shift.Medewerkers,
+            'date': shift.Datum,
+            'free_at': window[0],
+            'load': 0,
+        })
+    return shifts_by_date
+
+
+# Function to automatically allocate the tasks of every date to the employees working that date
+def allocate_tasks(employees_df, tasks_df):
+    """Assign tasks per date to shifts that can take them.
+
+    A task goes to an employee whose function rank covers the task function,
+    whose shift window (overnight ends included) contains the task time and
+    whose location matches the task location when the task has one. Every
+    Taken sheet applies to each date falling on that weekday; trainees and
+    tasks without a time are left for manual allocation.
+
+    Both frames use the compact schema of schema.py: shift times in minutes,
+    Datum as dates and the function ranks in FunctionRank.
+    """
+    if employees_df.empty or tasks_df.empty:
+        return pd.DataFrame(columns=ASSIGNMENT_COLUMNS)
+
+    tasks_by_day = task_records(tasks_df)
+    shifts_by_date = shift_records(employees_df)
+
+    assignments = []
+    for date, shifts in sorted(shifts_by_date.items()):
+        day = TASK_DAYS[pd.Timestamp(date).dayofweek]
+        if day in tasks_by_day:
+            assignments.extend(allocate_day(shifts, tasks_by_day[day]))
+
+    return pd.DataFrame(assignments, columns=ASSIGNMENT_COLUMNS)
+
+
+# Function to key a date and dagdeel the same way for assignments, tasks and shifts
+def scope_key(date, dagdeel):
+    return pd.Timestamp(date), None if pd.isna(dagdeel) else str(dagdeel)
+
+
+# Function to get the (Datum, Dagdeel) scope keys of every assignment as an index
+def assignment_scope_keys(assignments_df):
+    dagdelen = assignments_df['Dagdeel'].astype(object)
+    return pd.MultiIndex.from_arrays([
+        assignments_df['Datum'].astype('datetime64[ns]'),
+        dagdelen.where(dagdelen.notna(), None),
+    ])
+
+
+# Function to identify tasks by weekday, TaskKey and repeat of that key within the day. TaskIds count
+# repeats of a key across the whole week, so adding or removing one task renumbers its later repeats;
+# the identity stays the same for them.
+def task_identities(tasks_df):
+    task_keys = tasks_df['TaskId'].astype(str).str.rsplit('_', n=1)
+    counters = task_keys.str[1].astype(int)
+    task_keys = task_keys.str[0]
+    days = tasks_df['Day'].astype(object)
+    repeats = counters.groupby([days, task_keys], sort=False).rank(method='first').astype(int) - 1
+    return pd.MultiIndex.from_arrays([days, task_keys, repeats], names=['Day', 'TaskKey', 'Repeat'])
+
+
+# Function to diff the tasks before and after a change. Returns {previous TaskId: TaskId} for the
+# tasks that are still there unchanged, whatever their TaskId is now, and the TaskIds of the
+# added and changed tasks.
+def diff_tasks(previous_tasks_df, tasks_df):
+    if tasks_df.empty:
+        return {}, set()
+    if previous_tasks_df is None or previous_tasks_df.empty:
+        return {}, set(tasks_df['TaskId'])
+
+    def identified(frame):
+        return pd.DataFrame({
+            'TaskId': frame['TaskId'].astype(object).to_numpy(),
+            # Function and location are not part of the TaskKey, a change to them is a change of the task
+            'Function': frame['Function'].astype(object).fillna('').to_numpy(),
+            'Locatie': frame['Locatie'].astype(object).fillna('').to_numpy(),
+        }, index=task_identities(frame))
+
+    previous = identified(previous_tasks_df)
+    current = identified(tasks_df)
+    matched = previous.join(current, how='inner', lsuffix='_previous')
+    same = matched[(matched['Function_previous'] == matched['Function']) & (matched['Locatie_previous'] == matched['Locatie'])]
+    renumber = dict(zip(same['TaskId_previous'], same['TaskId']))
+    return renumber, set(current['TaskId']) - set(same['TaskId'])
+
+
+# Function to find the dates and dagdelen a change of shifts or tasks affects
+def repair_scope(assignments_df, keys, employees_df, tasks_df, changed_shifts, stale, changed_tasks):
+    changed_pairs = {(employee, pd.Timestamp(date)) for employee, date in changed_shifts}
+
+    # Assignments held by a changed shift or pointing at a removed or changed task are redone
+    redo = np.asarray(stale, dtype=bool).copy()
+    if changed_pairs:
+        shift_keys = pd.MultiIndex.from_arrays([assignments_df['Medewerkers'].astype(object), keys.get_level_values(0)])
+        redo |= shift_keys.isin(changed_pairs)
+    scope = set(keys[redo])
+
+    if employees_df.empty or tasks_df.empty:
+        return scope
+    dates_by_day = {}
+    for date in employees_df['Datum'].unique():
+        dates_by_day.setdefault(TASK_DAYS[pd.Timestamp(date).dayofweek], []).append(pd.Timestamp(date))
+
+    # Added or re-timed tasks are placed on every date of their weekday
+    for task in tasks_df[tasks_df['TaskId'].isin(changed_tasks)].itertuples(index=False):
+        for date in dates_by_day.get(task.Day, []):
+            scope.add(scope_key(date, task.Dagdeel))
+
+    # Added or re-timed shifts may take any task of their date falling inside their window
+    shifts = employees_df.iloc[:0]
+    if changed_pairs:
+        shift_keys = pd.MultiIndex.from_arrays([employees_df['Medewerkers'].astype(object), employees_df['Datum']])
+        shifts = employees_df[shift_keys.isin(changed_pairs)]
+    if not shifts.empty:
+        tasks_by_day = task_records(tasks_df[tasks_df['Day'].isin({
+            TASK_DAYS[pd.Timestamp(date).dayofweek] for date in shifts['Datum']
+        })])
+        for date, day_shifts in shift_records(shifts).items():
+            day_tasks = tasks_by_day.get(TASK_DAYS[pd.Timestamp(date).dayofweek], [])
+            for shift in day_shifts:
+                for task in day_tasks:
+                    if shift['start'] <= task['start'] and task['end'] <= shift['end']:
+                        scope.add(scope_key(date, task['dagdeel']))
+    return scope
+
+
+# Function to repair an allocation after shifts or tasks changed, re-allocating only what the change affects
+def repair_allocation(assignments_df, employees_df, tasks_df, changed_shifts=(), previous_tasks_df=None):
+    """Re-allocate the dates and dagdelen touched by a change, keeping every other assignment.
+
+    employees_df and tasks_df are the frames after the change. changed_shifts
+    holds (Medewerkers, Datum) pairs of shifts that were removed, added or
+    re-timed. previous_tasks_df is the task list the assignments were made
+    for when the Taken sheets changed: the two are diffed to find the added,
+    removed and changed tasks, and the kept assignments follow the TaskIds
+    their tasks were renumbered to. Assignments of tasks that no longer
+    exist are dropped. Assignments in an affected date and dagdeel are
+    released and their tasks allocated again with allocate_day, around the
+    tasks the shifts keep holding.
+
+    Returns the repaired assignments and the affected dates; rows on other
+    dates are unchanged, so AssignmentStore.replace only needs those dates.
+    """
+    if assignments_df.empty:
+        assignments_df = pd.DataFrame(columns=ASSIGNMENT_COLUMNS)
+    changed_shifts = list(changed_shifts)
+    if previous_tasks_df is None:
+        renumber = {} if tasks_df.empty else {task_id: task_id for task_id in tasks_df['TaskId']}
+        changed_tasks = set()
+    else:
+        renumber, changed_tasks = diff_tasks(previous_tasks_df, tasks_df)
+
+    # Assignments whose task was removed or changed are stale, the others move to the task's new TaskId
+    task_ids = assignments_df['TaskId'].astype(object).map(renumber)
+    stale = task_ids.isna().to_numpy()
+    renumbered = ~stale & (task_ids != assignments_df['TaskId']).to_numpy()
+    assignments_df = assignments_df.assign(TaskId=task_ids.where(~stale, assignments_df['TaskId'].astype(object)))
+
+    keys = assignment_scope_keys(assignments_df)
+    scope = repair_scope(assignments_df, keys, employees_df, tasks_df, changed_shifts, stale, changed_tasks)
+    scope_dates = sorted({date for date, _ in scope})
+    dates = sorted(set(scope_dates) | set(keys.get_level_values(0)[renumbered]))
+    if not scope:
+        return assignments_df, dates
+
+    kept = assignments_df[~keys.isin(scope)]
+    if employees_df.empty or tasks_df.empty:
+        return kept.reset_index(drop=True), dates
+
+    # Only the shifts and tasks of the affected dates are turned into records
+    days = {TASK_DAYS[date.dayofweek] for date in scope_dates}
+    tasks_by_day = task_records(tasks_df[tasks_df['Day'].isin(days)])
+    shifts_by_date = shift_records(employees_df[employees_df['Datum'].isin(scope_dates)])
+
+    repaired = []
+    for date in scope_dates:
+        day_tasks = tasks_by_day.get(TASK_DAYS[date.dayofweek], [])
+        windows = {task['task_id']: (task['start'], task['end']) for task in day_tasks}
+        kept_today = kept[kept['Datum'] == date]
+
+        # Tasks kept on this date block their times and count towards the load of their shift
+        busy = {}
+        for employee, task_id in zip(kept_today['Medewerkers'], kept_today['TaskId']):
+            if task_id in windows:
+                busy.setdefault(employee, []).append(windows[task_id])
+        shifts = shifts_by_date.get(date, [])
+        for shift in shifts:
+            intervals = sorted(busy.get(shift['employee'], []))
+            shift['busy'] = ([start for start, _ in intervals], [end for _, end in intervals])
+            shift['load'] = len(intervals)
+
+        held = set(kept_today['TaskId'])
+        tasks = [
+            task for task in day_tasks
+            if scope_key(date, task['dagdeel']) in scope and task['task_id'] not in held
+        ]
+        repaired.extend(allocate_day(shifts, tasks))
+
+    repaired_df = pd.DataFrame(repaired, columns=ASSIGNMENT_COLUMNS)
+    if repaired_df.empty:
+        return kept.reset_index(drop=True), dates
+    return pd.concat([kept, repaired_df], ignore_index=True), dates
@@ -0,0 +1,204 @@
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from allocation import ASSIGNMENT_COLUMNS
+
+DEFAULT_ASSIGNMENT_DB = os.path.join(os.path.expanduser('~'), '.cache', 'task-allocation-app', 'assignments.sqlite')
+
+# Bump when the tables change, open() migrates databases of an older version
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assignments (
+    Roster TEXT NOT NULL,
+    Medewerkers TEXT NOT NULL,
+    Datum TEXT NOT NULL,
+    TaskId TEXT NOT NULL,
+    Locatie TEXT,
+    Dagdeel TEXT,
+    PRIMARY KEY (Roster, Medewerkers, Datum, TaskId)
+);
+CREATE INDEX IF NOT EXISTS assignments_by_date ON assignments (Roster, Datum);
+CREATE INDEX IF NOT EXISTS assignments_by_location ON assignments (Roster, Locatie, Datum);
+CREATE INDEX IF NOT EXISTS assignments_by_dagdeel ON assignments (Roster, Dagdeel, Datum);
+CREATE TABLE IF NOT EXISTS roster_versions (
+    Roster TEXT PRIMARY KEY,
+    Version INTEGER NOT NULL
+);
+"""
+
+# Version 0 stored the assignments without a roster, they are kept under the roster ''
+MIGRATE_UNKEYED = """
+ALTER TABLE assignments RENAME TO assignments_unkeyed;
+DROP INDEX IF EXISTS assignments_by_date;
+DROP INDEX IF EXISTS assignments_by_location;
+DROP INDEX IF EXISTS assignments_by_dagdeel;
+"""
+
+UPSERT = """
+INSERT INTO assignments (Roster, Medewerkers, Datum, TaskId, Locatie, Dagdeel) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (Roster, Medewerkers, Datum, TaskId) DO UPDATE SET Locatie = excluded.Locatie, Dagdeel = excluded.Dagdeel
+"""
+
+BUMP_VERSION = """
+INSERT INTO roster_versions (Roster, Version) VALUES (?, 1)
+ON CONFLICT (Roster) DO UPDATE SET Version = Version + 1
+"""
+
+# Format of the saved assignments files the generated page downloads
+SAVED_ASSIGNMENTS_FORMAT = 'task-allocation-assignments'
+
+
+# Function to get the roster name the assignments of a workbook are stored under, its file name without extension
+def roster_name(file_name):
+    return os.path.splitext(os.path.basename(file_name))[0]
+
+
+# Function to format dates (strings, Timestamps or a datetime column) as the stored 'YYYY-MM-DD',
+# formatting each distinct date once
+def date_strings(dates):
+    codes, uniques = pd.factorize(pd.Series(list(dates) if not isinstance(dates, pd.Series) else dates))
+    formatted = np.array([pd.Timestamp(date).strftime('%Y-%m-%d') for date in uniques] + [None], dtype=object)
+    return formatted[codes].tolist()
+
+
+# Function to turn an assignments DataFrame into rows for the assignments table
+def assignment_rows(roster, assignments_df):
+    if assignments_df.empty:
+        return []
+    columns = {
+        column: assignments_df[column].astype(object).where(assignments_df[column].notna(), None).tolist()
+        if column in assignments_df.columns else [None] * len(assignments_df)
+        for column in ASSIGNMENT_COLUMNS
+    }
+    columns['Datum'] = date_strings(assignments_df['Datum'])
+    return [(roster, *row) for row in zip(*(columns[column] for column in ASSIGNMENT_COLUMNS))]
+
+
+# Function to read a saved assignments file downloaded from the generated page
+def read_saved_assignments(data):
+    """Return (roster, dates, assignments_df) of a saved assignments file.
+
+    dates are every date the page showed, the assignments replace whatever
+    was stored for the roster on those dates. Raises ValueError for files
+    that are not saved assignments.
+    """
+    try:
+        saved = json.loads(data)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f'not a saved assignments file: {e}') from None
+    if not isinstance(saved, dict) or saved.get('format') != SAVED_ASSIGNMENTS_FORMAT:
+        raise ValueError('not a saved assignments file')
+    assignments_df = pd.DataFrame(saved.get('assignments', []), columns=ASSIGNMENT_COLUMNS)
+    if assignments_df[['Medewerkers', 'Datum', 'TaskId']].isna().any(axis=None):
+        raise ValueError('saved assignments without Medewerkers, Datum or TaskId')
+    return saved.get('roster') or '', saved.get('dates', []), assignments_df
+
+
+# Task assignments kept in a local SQLite database, keyed by Roster + Medewerkers + Datum + TaskId.
+# Roster names the workbook the assignments were made for, so rosters sharing dates stay apart.
+class AssignmentStore:
+    def __init__(self, path=DEFAULT_ASSIGNMENT_DB):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Shared by the worker threads of the app, every access goes through the lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode = WAL')
+            self.connection.execute('PRAGMA synchronous = NORMAL')
+            self.migrate()
+
+    def migrate(self):
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        unkeyed = version < 1 and self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'assignments'"
+        ).fetchone() is not None
+        if unkeyed:
+            self.connection.executescript(MIGRATE_UNKEYED)
+        self.connection.executescript(SCHEMA)
+        if unkeyed:
+            self.connection.execute(
+                "INSERT INTO assignments SELECT '', Medewerkers, Datum, TaskId, Locatie, Dagdeel FROM assignments_unkeyed"
+            )
+            self.connection.execute('DROP TABLE assignments_unkeyed')
+        self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def version(self, roster):
+        """Return a number that changes whenever the stored assignments of roster change"""
+        with self._lock:
+            row = self.connection.execute('SELECT Version FROM roster_versions WHERE Roster = ?', (roster,)).fetchone()
+        return row[0] if row else 0
+
+    def save(self, roster, assignments_df):
+        """Insert or update the assignments of roster in one transaction"""
+        rows = assignment_rows(roster, assignments_df)
+        with self._lock, self.connection:
+            self.connection.executemany(UPSERT, rows)
+            self.connection.execute(BUMP_VERSION, (roster,))
+        return len(rows)
+
+    def replace(self, roster, dates, assignments_df):
+        """Replace every stored assignment of roster on dates with assignments_df, in one transaction"""
+        rows = assignment_rows(roster, assignments_df)
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'DELETE FROM assignments WHERE Roster = ? AND Datum = ?', [(roster, date) for date in date_strings(dates)]
+            )
+            self.connection.executemany(UPSERT, rows)
+            self.connection.execute(BUMP_VERSION, (roster,))
+        return len(rows)
+
+    def delete(self, roster, assignments_df):
+        """Remove the given Medewerkers/Datum/TaskId assignments of roster"""
+        rows = [row[:4] for row in assignment_rows(roster, assignments_df)]
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'DELETE FROM assignments WHERE Roster = ? AND Medewerkers = ? AND Datum = ? AND TaskId = ?', rows
+            )
+            self.connection.execute(BUMP_VERSION, (roster,))
+
+    def load(self, roster, dates=None, location=None, dagdeel=None):
+        """Return the stored assignments of roster, optionally only those on dates, at a location or in a dagdeel"""
+        conditions = ['Roster = ?']
+        parameters = [roster]
+        if dates is not None:
+            dates = date_strings(dates)
+            conditions.append(f"Datum IN ({', '.join('?' * len(dates))})")
+            parameters.extend(dates)
+        if location is not None:
+            conditions.append('Locatie = ?')
+            parameters.append(location)
+        if dagdeel is not None:
+            conditions.append('Dagdeel = ?')
+            parameters.append(dagdeel)
+        where = ' AND '.join(conditions)
+
+        with self._lock:
+            rows = self.connection.execute(
+                f"SELECT {', '.join(ASSIGNMENT_COLUMNS)} FROM assignments WHERE {where} ORDER BY Datum, Medewerkers, rowid",
+                parameters,
+            ).fetchall()
+        assignments_df = pd.DataFrame(rows, columns=ASSIGNMENT_COLUMNS)
+        assignments_df['Datum'] = pd.to_datetime(assignments_df['Datum'], format='%Y-%m-%d').astype('datetime64[ns]')
+        return assignments_df
+
+    def import_saved(self, data, roster=None):
+        """Store a saved assignments file from the page, returning (roster, number of assignments).
+
+        With roster, a file saved for another roster raises ValueError instead of being stored.
+        """
+        saved_roster, dates, assignments_df = read_saved_assignments(data)
+        if roster is not None and saved_roster != roster:
+            raise ValueError(f"the assignments were saved for roster '{saved_roster}', not '{roster}'")
+        return saved_roster, self.replace(saved_roster, dates, assignments_df)
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
@@ -0,0 +1,155 @@
+"""Benchmark the ingestion and render pipeline on synthetic rosters.
+
+Usage: python -m benchmarks.bench [--sizes small,medium,large] [--output FILE] [--compare FILE]
+
+Every stage is timed on its own and run once more under tracemalloc for
+its peak allocation. Results are appended as one JSON line per run, so
+successive runs can be compared with --compare.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from allocation import allocate_tasks
+from benchmarks.synthetic import write_workbook
+from processing import (
+    generate_html,
+    iter_daily_tasks,
+    iter_employee_shifts,
+    parse_shift_cell,
+    read_daily_tasks,
+    read_employee_schedule,
+)
+from validation import validate_allocation
+from workbook import load_workbook_data
+
+# (employees, days, tasks per day) per named roster size
+SIZES = {
+    'small': (50, 7, 40),
+    'medium': (200, 14, 150),
+    'large': (400, 35, 300),
+    'xlarge': (1000, 60, 600),
+}
+
+DEFAULT_RESULTS = os.path.join(os.path.dirname(__file__), 'results.jsonl')
+
+
+# Function to run one stage, returning its result with wall time and peak allocation.
+# tracemalloc slows Python code down, so the stage is timed and traced in separate runs.
+def measure(stage):
+    started = time.perf_counter()
+    result = stage()
+    seconds = time.perf_counter() - started
+
+    tracemalloc.start()
+    stage()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {'seconds': round(seconds, 4), 'peak_mb': round(peak / 1024 / 1024, 2)}
+
+
+# Function to benchmark every pipeline stage on one synthetic workbook
+def benchmark_size(name, employees, days, tasks_per_day, directory):
+    path = os.path.join(directory, f'{name}.xlsx')
+    write_workbook(path, employees=employees, days=days, tasks_per_day=tasks_per_day)
+
+    stages = {}
+    workbook, stages['load_workbook'] = measure(lambda: load_workbook_data(path))
+    employees_df, stages['read_employee_schedule'] = measure(lambda: read_employee_schedule(workbook))
+    tasks_df, stages['read_daily_tasks'] = measure(lambda: read_daily_tasks(workbook))
+
+    cells = workbook['Medewerkers'].values.iloc[8:, 3:].to_numpy().ravel()
+    _, stages['parse_shift_cell'] = measure(lambda: [parse_shift_cell(cell) for cell in cells])
+
+    assignments_df, stages['allocate_tasks'] = measure(lambda: allocate_tasks(employees_df, tasks_df))
+    _, stages['validate_allocation'] = measure(lambda: validate_allocation(employees_df, tasks_df, assignments_df))
+
+    html_content, stages['generate_html'] = measure(lambda: generate_html(employees_df, tasks_df))
+    stages['generate_html']['html_kb'] = round(len(html_content.encode('utf-8')) / 1024, 1)
+
+    _, stages['stream_employee_schedule'] = measure(lambda: read_employee_schedule(iter_employee_shifts(path)))
+    _, stages['stream_daily_tasks'] = measure(lambda: read_daily_tasks(iter_daily_tasks(path)))
+
+    return {
+        'size': name,
+        'employees': employees,
+        'days': days,
+        'tasks_per_day': tasks_per_day,
+        'workbook_kb': round(os.path.getsize(path) / 1024, 1),
+        'shift_records': len(employees_df),
+        'task_records': len(tasks_df),
+        'stages': stages,
+    }
+
+
+# Function to describe the code and machine the run was made on
+def run_metadata():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+    }
+
+
+# Function to print the results, with the change against an earlier run when given
+def print_results(results, baseline=None):
+    previous = {}
+    if baseline:
+        previous = {(size['size'], stage): values for size in baseline['sizes'] for stage, values in size['stages'].items()}
+
+    print(f"{'Size':<8} {'Stage':<26} {'Seconds':>9} {'Peak MB':>9} {'HTML KB':>9} {'vs base':>9}")
+    for size in results['sizes']:
+        for stage, values in size['stages'].items():
+            before = previous.get((size['size'], stage))
+            change = f"{values['seconds'] / before['seconds']:>8.2f}x" if before and before['seconds'] else ''
+            html_kb = values.get('html_kb', '')
+            print(f"{size['size']:<8} {stage:<26} {values['seconds']:>9.4f} {values['peak_mb']:>9.2f} {html_kb:>9} {change:>9}")
+
+
+# Function to read the last run stored in a results file
+def last_run(path):
+    with open(path, encoding='utf-8') as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the roster ingestion and render pipeline.')
+    parser.add_argument('--sizes', default='small,medium,large', help=f"comma separated, from {', '.join(SIZES)}")
+    parser.add_argument('--output', default=DEFAULT_RESULTS, help='JSON lines file the run is appended to')
+    parser.add_argument('--compare', help='results file whose last run is shown as baseline')
+    args = parser.parse_args(argv)
+
+    # The readers report progress through logging, keep the benchmark output readable
+    logging.getLogger('processing').setLevel(logging.ERROR)
+
+    baseline = last_run(args.compare) if args.compare else None
+    results = run_metadata()
+    with tempfile.TemporaryDirectory() as directory:
+        results['sizes'] = [
+            benchmark_size(name, *SIZES[name], directory) for name in args.sizes.split(',')
+        ]
+
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(results) + '\n')
+
+    print_results(results, baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Load test the shared upload worker pool with concurrent simulated sessions.
+
+Usage: python -m benchmarks.load [--sessions 12] [--distinct 6] [--workers 2] [--queue 16] [--size small]
+
+Every session submits a synthetic roster to a JobRunner the way the app does
+and waits for the result. Sessions uploading the same roster while it is
+still being processed are coalesced into one job, submissions rejected by a
+full queue back off and retry. Reports throughput and latency percentiles.
+"""
+import argparse
+import io
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from functools import partial
+
+import numpy as np
+
+from benchmarks.bench import SIZES
+from benchmarks.synthetic import write_workbook
+from cache import content_key
+from jobs import JobRunner, QueueFull
+from processing import process_workbook
+
+
+# Function to write the distinct rosters the sessions upload, returned as bytes
+def make_uploads(distinct, size, directory):
+    employees, days, tasks_per_day = SIZES[size]
+    uploads = []
+    for seed in range(distinct):
+        path = os.path.join(directory, f'roster_{seed}.xlsx')
+        write_workbook(path, employees=employees, days=days, tasks_per_day=tasks_per_day, seed=seed)
+        with open(path, 'rb') as f:
+            uploads.append(f.read())
+    return uploads
+
+
+# Function to simulate one session: submit an upload, back off while the queue is full and wait for it
+def run_session(runner, file_bytes, start_delay, backoff, results):
+    time.sleep(start_delay)
+    started = time.perf_counter()
+    key = content_key(file_bytes)
+    retries = 0
+    while True:
+        try:
+            job = runner.submit(key, partial(process_workbook, io.BytesIO(file_bytes)))
+            break
+        except QueueFull:
+            retries += 1
+            time.sleep(backoff)
+    job.future.result()
+    results.append({
+        'latency': time.perf_counter() - started,
+        'queue_wait': job.started - job.submitted,
+        'retries': retries,
+    })
+
+
+# Function to format percentiles of a list of seconds
+def percentiles(values):
+    return '  '.join(f"p{p}={np.percentile(values, p):.2f}s" for p in (50, 95, 99)) + f"  max={max(values):.2f}s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the upload worker pool.')
+    parser.add_argument('--sessions', type=int, default=12, help='number of concurrent sessions')
+    parser.add_argument('--distinct', type=int, default=6, help='number of distinct rosters they upload')
+    parser.add_argument('--size', default='small', choices=list(SIZES), help='synthetic roster size')
+    parser.add_argument('--workers', type=int, default=2, help='worker threads of the pool')
+    parser.add_argument('--queue', type=int, default=16, help='jobs allowed to wait for a worker')
+    parser.add_argument('--spread', type=float, default=1.0, help='sessions start at random within this many seconds')
+    parser.add_argument('--backoff', type=float, default=0.5, help='seconds to wait before resubmitting to a full queue')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # The readers report progress through logging, keep the output readable
+    logging.getLogger('processing').setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as directory:
+        uploads = make_uploads(args.distinct, args.size, directory)
+
+    rng = random.Random(args.seed)
+    runner = JobRunner(max_workers=args.workers, max_queued=args.queue)
+    results = []
+    sessions = [
+        threading.Thread(
+            target=run_session,
+            args=(runner, uploads[session % len(uploads)], rng.uniform(0, args.spread), args.backoff, results),
+        )
+        for session in range(args.sessions)
+    ]
+
+    started = time.perf_counter()
+    for session in sessions:
+        session.start()
+    for session in sessions:
+        session.join()
+    elapsed = time.perf_counter() - started
+    runner.shutdown()
+
+    stats = runner.stats()
+    print(f"{len(results)} sessions, {args.distinct} distinct rosters ({args.size}), "
+          f"{args.workers} workers, queue {args.queue}")
+    print(f"Wall time     {elapsed:.2f}s, {len(results) / elapsed:.2f} uploads/s, "
+          f"{stats['completed']} parses, {stats['coalesced']} coalesced, {stats['rejected']} rejected submissions")
+    print(f"Latency       {percentiles([result['latency'] for result in results])}")
+    print(f"Queue wait    {percentiles([result['queue_wait'] for result in results])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Write synthetic rosters in the layout of the real weekly workbooks.
+
+Usage: python -m benchmarks.synthetic OUTPUT.xlsx [--employees N] [--days N] [--tasks-per-day N] [--seed N]
+"""
+import argparse
+import datetime
+import random
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill
+
+from workbook import EMPLOYEE_SHEET, TASK_DAYS
+
+FUNCTIONS = [
+    '1. Crew Chief', '2. Teamleader', '3. Deur Coördinator', '4. WH Agent A', '5. WH Agent B',
+    '6. WH Agent C', '7. WH Agent D', '8. WH Agent E+', '9. WH Agent E',
+]
+TASK_FUNCTIONS = ['CC', 'TL', 'DC', 'A', 'B', 'C', 'D', 'E+', 'E']
+LOCATIONS = ['Hal 1', 'Hal 2', 'Hal 3', 'Loods 5', 'Platform Noord']
+TASK_NAMES = ['Laden', 'Lossen', 'Sorteren', 'Controle', 'Opbouw ULD', 'Afbouw ULD', 'Douane']
+
+# Shift start/end pairs; the last ones run overnight and end on the next day
+DAY_SHIFTS = ['05:30-14:00', '06:00-14:30', '08:30-17:00', '09:00-17:30', '10:00-18:30', '13:00-21:30', '14:00-22:30']
+OVERNIGHT_SHIFTS = ['21:30-06:00+1', '22:00-06:30+1', '23:00-07:30+1']
+
+# Fill colour mix of the schedule cells: normal, excluded (leave, sick, ...) and training
+NORMAL_COLORS = ['FFFFFFFF', 'FF92D050', 'FFC0C0C0']
+EXCLUDED_COLORS = ['FFFFFF00', 'FFFF3B3B', 'FF00FFFF', 'FFFFA9D4']
+TRAINING_COLORS = ['FF33CCCC']
+
+
+# Function to create (and reuse) the solid fill of a colour
+def solid_fill(color, fills):
+    if color not in fills:
+        fills[color] = PatternFill('solid', start_color=color, end_color=color)
+    return fills[color]
+
+
+# Function to build one schedule cell value, a shift with locations or one of the non-shift markers
+def shift_value(rng, overnight_ratio):
+    roll = rng.random()
+    if roll < 0.12:
+        return None
+    if roll < 0.16:
+        return f'[{rng.choice(LOCATIONS)} (A)]'
+    if roll < 0.18:
+        return 'File'
+    shift = rng.choice(OVERNIGHT_SHIFTS if rng.random() < overnight_ratio else DAY_SHIFTS)
+    locations = ', '.join(f'{location} ({rng.choice("ABC")})' for location in rng.sample(LOCATIONS, rng.randint(1, 2)))
+    return f'{shift} [{locations}]'
+
+
+# Function to write a synthetic roster workbook
+def write_workbook(path, employees=200, days=14, tasks_per_day=150, seed=0,
+                   excluded_ratio=0.1, training_ratio=0.05, overnight_ratio=0.15,
+                   start_date=datetime.date(2025, 3, 3)):
+    rng = random.Random(seed)
+    fills = {}
+    wb = openpyxl.Workbook(write_only=True)
+
+    sheet = wb.create_sheet(EMPLOYEE_SHEET)
+    for _ in range(7):
+        sheet.append([])
+    dates = [(start_date + datetime.timedelta(days=offset)).strftime('%d-%m-%Y') for offset in range(days)]
+    sheet.append(['Voornaam', 'Achternaam', 'Functie'] + dates)
+
+    for employee in range(employees):
+        row = [f'Voornaam{employee}', f'Achternaam{employee}', rng.choice(FUNCTIONS)]
+        for _ in range(days):
+            roll = rng.random()
+            if roll < excluded_ratio:
+                color = rng.choice(EXCLUDED_COLORS)
+            elif roll < excluded_ratio + training_ratio:
+                color = rng.choice(TRAINING_COLORS)
+            else:
+                color = rng.choice(NORMAL_COLORS)
+            cell = WriteOnlyCell(sheet, value=shift_value(rng, overnight_ratio))
+            cell.fill = solid_fill(color, fills)
+            row.append(cell)
+        sheet.append(row)
+
+    for day in TASK_DAYS:
+        sheet = wb.create_sheet(f'Taken {day}')
+        sheet.append(['Taak', 'Functie', 'Starttijd', 'Eindtijd', 'Vlucht', 'Locatie'])
+        for _ in range(tasks_per_day):
+            start = datetime.time(rng.randint(0, 23), rng.choice([0, 15, 30, 45]))
+            end = datetime.time((start.hour + rng.randint(1, 4)) % 24, start.minute)
+            name = WriteOnlyCell(sheet, value=f'{rng.choice(TASK_NAMES)}\nVlucht KL{rng.randint(100, 999)}')
+            name.fill = solid_fill(rng.choice(NORMAL_COLORS), fills)
+            sheet.append([
+                name, rng.choice(TASK_FUNCTIONS), start, end,
+                f'KL{rng.randint(100, 999)}', rng.choice(LOCATIONS + ['']) or None,
+            ])
+
+    wb.save(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic roster workbook.')
+    parser.add_argument('output', help='path of the .xlsx file to write')
+    parser.add_argument('--employees', type=int, default=200)
+    parser.add_argument('--days', type=int, default=14)
+    parser.add_argument('--tasks-per-day', type=int, default=150)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    write_workbook(args.output, args.employees, args.days, args.tasks_per_day, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+# Function to compute the cache key of an uploaded file from its contents
+def content_key(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# Function to compute the cache key of an upload's page: the page embeds the assignments saved for
+# the roster, so the key changes with the roster and every write to its saved assignments
+def upload_key(data, roster, assignments_version):
+    return f'{content_key(data)}:{roster}:{assignments_version}'
+
+
+# Size-bounded LRU cache shared by every session of the Streamlit process
+class UploadCache:
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached value for key, or None, and update the hit/miss counters"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries beyond max_entries"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Parsed uploads and generated HTML, kept for the lifetime of the server process
+upload_cache = UploadCache()
@@ -0,0 +1,154 @@
+"""Generate task allocation pages for many workbooks without the Streamlit app.
+
+Usage: python cli.py ROSTERS... [--output-dir DIR] [--store DIR] [--assignments DB] [--workers N] [--task-workers N]
+                     [--export xlsx|csv] [--load-assignments FILE]
+
+ROSTERS are .xlsx files, directories containing them or glob patterns. Saved assignments are stored
+per roster under the workbook's file name without extension.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from assignment_store import AssignmentStore, roster_name
+from export import EXPORT_FORMATS, export_assignments, write_exports
+from processing import process_workbook
+from store import SheetStore
+
+
+# Function to expand files, directories and glob patterns into a sorted list of workbooks
+def find_workbooks(inputs):
+    workbooks = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*.xlsx')
+        for path in glob.glob(pattern):
+            # Skip the lock files Excel leaves next to open workbooks
+            if path.endswith('.xlsx') and not os.path.basename(path).startswith('~$'):
+                workbooks.add(os.path.abspath(path))
+    return sorted(workbooks)
+
+
+# Function to process one workbook and write its HTML page, run inside a worker process.
+# export_formats also writes the allocation and flight schedule as .xlsx and/or CSV files.
+def render_workbook(file_path, output_dir, store_dir=None, task_workers=None, assignments_path=None, export_formats=()):
+    started = time.perf_counter()
+    store = SheetStore(store_dir) if store_dir else None
+    assignment_store = AssignmentStore(assignments_path) if assignments_path else None
+    roster = roster_name(file_path)
+    base_path = os.path.join(output_dir or os.path.dirname(file_path), roster)
+    exports = []
+    try:
+        employees_df, tasks_df, html_content = process_workbook(
+            file_path, store=store, task_workers=task_workers, assignment_store=assignment_store, roster=roster
+        )
+        if export_formats and not employees_df.empty:
+            saved_assignments_df = None
+            if assignment_store is not None:
+                saved_assignments_df = assignment_store.load(roster, dates=employees_df['Datum'].unique())
+            assignments_df = export_assignments(employees_df, tasks_df, saved_assignments_df)
+            exports = write_exports(base_path, employees_df, tasks_df, assignments_df, export_formats)
+    finally:
+        if assignment_store is not None:
+            assignment_store.close()
+
+    output_path = base_path + '.html'
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(html_content)
+
+    return {
+        'file': file_path,
+        'output': output_path,
+        'exports': exports,
+        'employees': len(employees_df),
+        'tasks': len(tasks_df),
+        'html_bytes': len(html_content.encode('utf-8')),
+        'seconds': time.perf_counter() - started,
+    }
+
+
+# Function to store the saved assignments files the pages downloaded, before the pages are generated again
+def load_saved_assignments(assignments_path, saved_paths):
+    assignment_store = AssignmentStore(assignments_path)
+    try:
+        for saved_path in saved_paths:
+            with open(saved_path, 'rb') as f:
+                roster, count = assignment_store.import_saved(f.read())
+            print(f"Stored {count} saved assignments for {roster} from {saved_path}")
+    finally:
+        assignment_store.close()
+
+
+# Function to print the per-file timing summary
+def print_summary(results, failures, elapsed):
+    width = max([len(os.path.basename(result['file'])) for result in results] + [len('Workbook')])
+    print(f"{'Workbook':<{width}}  {'Shifts':>7}  {'Tasks':>6}  {'HTML KB':>8}  {'Seconds':>8}")
+    for result in sorted(results, key=lambda result: result['file']):
+        print(
+            f"{os.path.basename(result['file']):<{width}}  {result['employees']:>7}  {result['tasks']:>6}  "
+            f"{result['html_bytes'] / 1024:>8.1f}  {result['seconds']:>8.2f}"
+        )
+    for file_path, error in failures:
+        print(f"FAILED {file_path}: {error}", file=sys.stderr)
+    print(f"{len(results)} workbook(s) processed, {len(failures)} failed in {elapsed:.2f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate task allocation HTML pages for Excel rosters.')
+    parser.add_argument('inputs', nargs='+', help='.xlsx files, directories or glob patterns')
+    parser.add_argument('-o', '--output-dir', help='directory for the HTML files (default: next to each workbook)')
+    parser.add_argument('-s', '--store', help='directory of parsed sheets, re-runs only parse the sheets that changed')
+    parser.add_argument('-a', '--assignments', help='SQLite assignment store whose saved assignments the pages start with')
+    parser.add_argument(
+        '-l', '--load-assignments', action='append', default=[], metavar='FILE',
+        help="store a page's saved assignments file in the --assignments store first, can be given more than once"
+    )
+    parser.add_argument(
+        '-e', '--export', action='append', choices=EXPORT_FORMATS, default=[],
+        help='also write the allocation and flight schedule in this format, can be given twice'
+    )
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument(
+        '-t', '--task-workers', type=int,
+        help='processes parsing the day sheets of one streamed or stored workbook in parallel'
+    )
+    args = parser.parse_args(argv)
+    if args.load_assignments:
+        if not args.assignments:
+            parser.error('--load-assignments needs --assignments')
+        try:
+            load_saved_assignments(args.assignments, args.load_assignments)
+        except (OSError, ValueError) as e:
+            parser.error(f'could not load saved assignments: {e}')
+
+    workbooks = find_workbooks(args.inputs)
+    if not workbooks:
+        parser.error('no .xlsx files found')
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    results = []
+    failures = []
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(workbooks)))) as executor:
+        futures = {
+            executor.submit(
+                render_workbook, path, args.output_dir, args.store, args.task_workers, args.assignments, args.export
+            ): path
+            for path in workbooks
+        }
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                failures.append((futures[future], str(e)))
+
+    print_summary(results, failures, time.perf_counter() - started)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
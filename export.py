@@ -0,0 +1,196 @@
+import csv
+import io
+from datetime import date as Date
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill
+
+from allocation import TASK_DAYS, allocate_tasks
+from schema import format_minutes
+
+# Columns of the allocation export, one row per shift
+ALLOCATION_COLUMNS = ['Datum', 'Medewerkers', 'Functie', 'Starttijd', 'Eindtijd', 'Locatie', 'Dagdeel', 'TaskIds']
+# Columns of the flight schedule export, one row per task and date
+FLIGHT_SCHEDULE_COLUMNS = ['Datum', 'Time', 'TaskName', 'Function', 'Locatie', 'Dagdeel', 'TaskId', 'Medewerkers']
+
+EXPORT_FORMATS = ['xlsx', 'csv']
+
+
+# Function to pick the assignments to export: the saved ones on the dates that have any,
+# the automatic allocation on every other date
+def export_assignments(employees_df, tasks_df, saved_assignments_df=None):
+    assignments_df = allocate_tasks(employees_df, tasks_df)
+    if saved_assignments_df is None or saved_assignments_df.empty:
+        return assignments_df
+    saved_dates = saved_assignments_df['Datum'].unique()
+    return pd.concat(
+        [assignments_df[~assignments_df['Datum'].isin(saved_dates)], saved_assignments_df], ignore_index=True
+    )
+
+
+# Function to convert an aRGB cell colour to the fill written to the export, None for no fill
+def export_fill(color):
+    if not isinstance(color, str) or color == 'FFFFFFFF':
+        return None
+    if len(color) == 6:
+        color = f'FF{color}'
+    # A fully transparent colour like the default '00000000' means the cell had no fill
+    if len(color) != 8 or color.startswith('00'):
+        return None
+    return PatternFill(fill_type='solid', fgColor=color)
+
+
+# Function to get the cell style for a fill colour and number format, registered with the workbook once.
+# Setting .fill on every cell would look the fill up in the workbook's style tables for each of them.
+def export_style(sheet, color, number_format, styles):
+    key = (color, number_format)
+    if key not in styles:
+        cell = WriteOnlyCell(sheet)
+        fill = export_fill(color)
+        if fill is not None:
+            cell.fill = fill
+        if number_format is not None:
+            cell.number_format = number_format
+        styles[key] = cell._style
+    return styles[key]
+
+
+# Function to yield the allocation one shift at a time, with the fill colour of the shift
+def allocation_rows(employees_df, assignments_df):
+    task_ids = {}
+    for employee, date, task_id in zip(assignments_df['Medewerkers'], assignments_df['Datum'], assignments_df['TaskId']):
+        task_ids.setdefault((employee, pd.Timestamp(date)), []).append(task_id)
+
+    for shift in employees_df.sort_values(['Datum', 'Medewerkers']).itertuples(index=False):
+        yield [
+            shift.Datum.date(),
+            shift.Medewerkers,
+            shift.Functie,
+            format_minutes(shift.Starttijd),
+            format_minutes(shift.Eindtijd),
+            shift.Locatie,
+            shift.Dagdeel,
+            ', '.join(task_ids.get((shift.Medewerkers, shift.Datum), [])),
+        ], shift.CellColor
+
+
+# Function to yield the task of every date with its assignee, with the fill colour of the task
+def flight_schedule_rows(employees_df, tasks_df, assignments_df):
+    assignees = {
+        (pd.Timestamp(date), task_id): employee
+        for employee, date, task_id in zip(assignments_df['Medewerkers'], assignments_df['Datum'], assignments_df['TaskId'])
+    }
+    tasks_by_day = {day: tasks for day, tasks in tasks_df.groupby('Day', observed=True, sort=False)}
+
+    for date in sorted(employees_df['Datum'].unique()):
+        date = pd.Timestamp(date)
+        tasks = tasks_by_day.get(TASK_DAYS[date.dayofweek])
+        if tasks is None:
+            continue
+        for task in tasks.itertuples(index=False):
+            yield [
+                date.date(),
+                task.Time,
+                task.TaskName,
+                task.Function,
+                task.Locatie,
+                task.Dagdeel,
+                task.TaskId,
+                assignees.get((date, task.TaskId), ''),
+            ], task.CellColor
+
+
+# Function to turn a value into what the export writes, empty for missing values
+def export_value(value):
+    if value is None or (not isinstance(value, Date) and pd.isna(value)):
+        return ''
+    return value
+
+
+# Function to write the allocation and the flight schedule to an .xlsx file or buffer
+def write_allocation_xlsx(target, employees_df, tasks_df, assignments_df):
+    """Write an Allocation and a Flight schedule sheet.
+
+    The workbook is write-only: openpyxl streams every row to a temporary
+    file as it is appended instead of keeping the cells, so memory stays flat
+    for month-long rosters. Rows get the fill of their CellColor; one
+    cell style is shared by every cell of the same colour.
+    """
+    workbook = Workbook(write_only=True)
+    styles = {}
+    sheets = [
+        ('Allocation', ALLOCATION_COLUMNS, allocation_rows(employees_df, assignments_df)),
+        ('Flight schedule', FLIGHT_SCHEDULE_COLUMNS, flight_schedule_rows(employees_df, tasks_df, assignments_df)),
+    ]
+    for title, columns, rows in sheets:
+        sheet = workbook.create_sheet(title)
+        sheet.append(columns)
+        for values, color in rows:
+            cells = []
+            for value in values:
+                cell = WriteOnlyCell(sheet, export_value(value))
+                cell._style = export_style(sheet, color, 'yyyy-mm-dd' if isinstance(value, Date) else None, styles)
+                cells.append(cell)
+            sheet.append(cells)
+    workbook.save(target)
+
+
+# Function to write rows to a CSV text stream, one row at a time
+def write_csv_stream(stream, columns, rows):
+    writer = csv.writer(stream)
+    writer.writerow(columns)
+    for values, _ in rows:
+        writer.writerow([
+            value.isoformat() if isinstance(value, Date) else export_value(value) for value in values
+        ])
+
+
+# Function to write rows to a CSV file path or an open text stream
+def write_rows_csv(target, columns, rows):
+    if hasattr(target, 'write'):
+        write_csv_stream(target, columns, rows)
+        return
+    with open(target, 'w', encoding='utf-8', newline='') as stream:
+        write_csv_stream(stream, columns, rows)
+
+
+# Function to write the allocation to a CSV file or text stream
+def write_allocation_csv(target, employees_df, assignments_df):
+    write_rows_csv(target, ALLOCATION_COLUMNS, allocation_rows(employees_df, assignments_df))
+
+
+# Function to write the flight schedule to a CSV file or text stream
+def write_flight_schedule_csv(target, employees_df, tasks_df, assignments_df):
+    write_rows_csv(target, FLIGHT_SCHEDULE_COLUMNS, flight_schedule_rows(employees_df, tasks_df, assignments_df))
+
+
+# Function to build a download in memory: .xlsx with both sheets, the allocation as CSV ('csv')
+# or the flight schedule as CSV ('flights')
+def build_export(employees_df, tasks_df, assignments_df, export_format):
+    if export_format == 'xlsx':
+        buffer = io.BytesIO()
+        write_allocation_xlsx(buffer, employees_df, tasks_df, assignments_df)
+        return buffer.getvalue()
+    stream = io.StringIO()
+    if export_format == 'flights':
+        write_flight_schedule_csv(stream, employees_df, tasks_df, assignments_df)
+    else:
+        write_allocation_csv(stream, employees_df, assignments_df)
+    return stream.getvalue().encode('utf-8')
+
+
+# Function to write the exports of one roster next to base_path, returning the files written.
+# xlsx writes both sheets to one workbook, csv writes the allocation and the flight schedule as two files.
+def write_exports(base_path, employees_df, tasks_df, assignments_df, formats):
+    written = []
+    if 'xlsx' in formats:
+        written.append(f'{base_path}.allocation.xlsx')
+        write_allocation_xlsx(written[-1], employees_df, tasks_df, assignments_df)
+    if 'csv' in formats:
+        written.append(f'{base_path}.allocation.csv')
+        write_allocation_csv(written[-1], employees_df, assignments_df)
+        written.append(f'{base_path}.flights.csv')
+        write_flight_schedule_csv(written[-1], employees_df, tasks_df, assignments_df)
+    return written
@@ -0,0 +1,116 @@
+import contextvars
+import logging
+import time
+import tracemalloc
+import uuid
+
+# Span timings are logged as logfmt lines (span=... seconds=... rows=...) that are easy to scrape
+logger = logging.getLogger(__name__)
+
+_active_trace = contextvars.ContextVar('active_trace', default=None)
+_open_spans = contextvars.ContextVar('open_spans', default=())
+
+
+# Timing, peak allocation and row or byte count of one named stage
+class Span:
+    def __init__(self, name, depth):
+        self.name = name
+        self.depth = depth
+        self.seconds = None
+        self.peak_bytes = None
+        self.rows = None
+        self.bytes = None
+        self._started = None
+        self._start_memory = None
+        self._peak_seen = 0
+
+    def as_dict(self):
+        return {
+            'span': self.name,
+            'depth': self.depth,
+            'seconds': round(self.seconds, 4) if self.seconds is not None else None,
+            'peak_mb': round(self.peak_bytes / 1024 / 1024, 2) if self.peak_bytes is not None else None,
+            'rows': self.rows,
+            'bytes': self.bytes,
+        }
+
+
+# The spans recorded while processing one upload
+class Trace:
+    """Collects the spans opened while the trace is active.
+
+    With track_memory the peak allocation of every span is measured with
+    tracemalloc. That slows Python code down noticeably and the peaks
+    include allocations of other threads, so it is meant for diagnosing a
+    slow upload rather than for every run.
+    """
+
+    def __init__(self, track_memory=False):
+        self.track_memory = track_memory
+        # Ties the log lines of one upload together when sessions run concurrently
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.spans = []
+        self._token = None
+        self._started_tracing = False
+
+    def __enter__(self):
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._token = _active_trace.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _active_trace.reset(self._token)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return False
+
+    def as_records(self):
+        return [span.as_dict() for span in self.spans]
+
+
+# Context manager timing a named stage; set .rows or .bytes on the yielded span to record its size
+class span:
+    def __init__(self, name):
+        self.name = name
+        self.trace = _active_trace.get()
+        self.span = None
+        self._token = None
+
+    def __enter__(self):
+        parents = _open_spans.get()
+        self.span = Span(self.name, len(parents))
+        if self.trace is not None:
+            self.trace.spans.append(self.span)
+        self._token = _open_spans.set(parents + (self.span,))
+
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # The peak counter is reset for this span, keep what the parents have seen so far
+            for parent in parents:
+                parent._peak_seen = max(parent._peak_seen, peak)
+            tracemalloc.reset_peak()
+            self.span._start_memory = current
+        self.span._started = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, *exc_info):
+        current_span = self.span
+        current_span.seconds = time.perf_counter() - current_span._started
+        _open_spans.reset(self._token)
+
+        if tracemalloc.is_tracing() and current_span._start_memory is not None:
+            peak = max(tracemalloc.get_traced_memory()[1], current_span._peak_seen)
+            current_span.peak_bytes = max(peak - current_span._start_memory, 0)
+            for parent in _open_spans.get():
+                parent._peak_seen = max(parent._peak_seen, peak)
+
+        fields = {key: value for key, value in current_span.as_dict().items() if value is not None}
+        if self.trace is not None:
+            fields['trace'] = self.trace.trace_id
+        if exc_type is not None:
+            fields['error'] = exc_type.__name__
+        logger.info(' '.join(f'{key}={value}' for key, value in fields.items()))
+        return False
@@ -0,0 +1,184 @@
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Worker threads shared by every session, and how many jobs may wait for one of them
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUED = 16
+
+_current_job = contextvars.ContextVar('current_job', default=None)
+
+
+# Raised by JobRunner.submit when the queue is full, the upload should be submitted again later
+class QueueFull(Exception):
+    pass
+
+
+# Raised inside a job once it was cancelled. Like asyncio.CancelledError it is not an
+# Exception, so the per-sheet error handling of the readers does not swallow it.
+class JobCancelled(BaseException):
+    pass
+
+
+# Function to report the progress of the running job, raising JobCancelled when it was cancelled.
+# Outside a job (the CLI, the benchmarks) this does nothing.
+def report_progress(stage, done=None, total=None):
+    job = _current_job.get()
+    if job is None:
+        return
+    if job.cancel_event.is_set():
+        raise JobCancelled(job.key)
+    job.stage = stage
+    job.done = done
+    job.total = total
+
+
+# One upload being processed on a worker thread
+class Job:
+    def __init__(self, key, function):
+        self.key = key
+        self.function = function
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.stage = 'Waiting for a worker'
+        self.done = None
+        self.total = None
+        self.messages = []
+        # Sessions waiting for this job, identical uploads share one job
+        self.subscribers = 1
+        self.submitted = time.monotonic()
+        self.started = None
+        self.ended = None
+
+    def run(self):
+        token = _current_job.set(self)
+        self.started = time.monotonic()
+        try:
+            report_progress('Starting')
+            return self.function()
+        finally:
+            self.ended = time.monotonic()
+            _current_job.reset(token)
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self.future is not None:
+            # Only succeeds while the job is still queued, a running job stops at its next progress report
+            self.future.cancel()
+
+    @property
+    def finished(self):
+        return self.future is not None and self.future.done()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def progress(self):
+        """Return (fraction or None, text) describing the current stage"""
+        if self.done is not None and self.total:
+            return min(self.done / self.total, 1.0), f"{self.stage} {self.done}/{self.total}"
+        if self.done is not None:
+            return None, f"{self.stage} {self.done}"
+        return None, self.stage
+
+
+# Log handler keeping the records logged by a job, so the page can show them once it is done
+class JobLogHandler(logging.Handler):
+    def emit(self, record):
+        job = _current_job.get()
+        if job is not None:
+            job.messages.append((record.levelno, self.format(record)))
+
+
+# Runs jobs on a fixed pool of worker threads shared by every session of the process
+class JobRunner:
+    """Fixed-size worker pool with a bounded queue.
+
+    Submitting an upload whose job is still queued or running joins that job
+    instead of parsing the same workbook twice. Once max_queued jobs are
+    waiting, submit raises QueueFull so sessions back off instead of piling
+    up memory. A job is only cancelled when every session waiting for it has
+    released it.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_queued=DEFAULT_MAX_QUEUED):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.completed = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upload-job')
+        # Reentrant, a future finishing before add_done_callback runs its callback right away
+        self._lock = threading.RLock()
+        self._queued = []
+        self._in_flight = {}
+
+    def submit(self, key, function):
+        with self._lock:
+            job = self._in_flight.get(key)
+            if job is not None and not job.cancelled:
+                job.subscribers += 1
+                self.coalesced += 1
+                return job
+            if len(self._queued) >= self.max_queued:
+                self.rejected += 1
+                raise QueueFull(f"{len(self._queued)} uploads are waiting to be processed")
+
+            job = Job(key, function)
+            self._queued.append(job)
+            self._in_flight[key] = job
+            job.future = self._executor.submit(self._run, job)
+            job.future.add_done_callback(lambda future, job=job: self._finished(job))
+            return job
+
+    def _run(self, job):
+        with self._lock:
+            if job in self._queued:
+                self._queued.remove(job)
+        return job.run()
+
+    def _finished(self, job):
+        with self._lock:
+            if job in self._queued:
+                self._queued.remove(job)
+            if self._in_flight.get(job.key) is job:
+                del self._in_flight[job.key]
+            if not job.cancelled:
+                self.completed += 1
+
+    def release(self, job):
+        """Stop waiting for job, cancelling it when no other session waits for it"""
+        with self._lock:
+            job.subscribers -= 1
+            if job.subscribers > 0 or job.finished:
+                return
+            job.cancel()
+            if self._in_flight.get(job.key) is job:
+                del self._in_flight[job.key]
+
+    def position(self, job):
+        """Return the 1-based queue position of job, 0 once a worker runs it"""
+        with self._lock:
+            return self._queued.index(job) + 1 if job in self._queued else 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'queued': len(self._queued),
+                'max_queued': self.max_queued,
+                'running': len(self._in_flight) - len(self._queued),
+                'completed': self.completed,
+                'coalesced': self.coalesced,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Upload jobs, kept for the lifetime of the server process
+upload_jobs = JobRunner()
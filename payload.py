@@ -0,0 +1,151 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+TIME_PATTERN = re.compile(r'^([01]\d|2[0-3]):([0-5]\d)$')
+TIME_RANGE_PATTERN = re.compile(r'^([01]\d|2[0-3]):([0-5]\d) - ([01]\d|2[0-3]):([0-5]\d)$')
+
+# Decoder embedded in the page, rebuilds the record objects from the columnar payload.
+# Time columns use null for a missing value and -1 for an empty string.
+DECODER_JS = """
+            function formatMinutes(minutes) {
+                const hours = Math.floor(minutes / 60);
+                const rest = minutes % 60;
+                return `${hours < 10 ? '0' : ''}${hours}:${rest < 10 ? '0' : ''}${rest}`;
+            }
+
+            function decodeColumns(payload) {
+                const names = Object.keys(payload.columns);
+                const records = new Array(payload.length);
+                for (let i = 0; i < payload.length; i++) {
+                    const record = {};
+                    for (const name of names) {
+                        const column = payload.columns[name];
+                        if (column.minutes) {
+                            const minutes = column.minutes[i];
+                            record[name] = minutes === null ? null : (minutes < 0 ? '' : formatMinutes(minutes));
+                        } else if (column.start) {
+                            const start = column.start[i];
+                            record[name] = start === null ? null :
+                                (start < 0 ? '' : `${formatMinutes(start)} - ${formatMinutes(column.end[i])}`);
+                        } else {
+                            const code = column.codes[i];
+                            record[name] = code < 0 ? null : column.values[code];
+                        }
+                    }
+                    records[i] = record;
+                }
+                return records;
+            }
+"""
+
+
+# Function to convert a 'HH:MM' string to minutes, -1 for an empty string
+def time_minutes(value):
+    if value == '':
+        return -1
+    match = TIME_PATTERN.match(value) if isinstance(value, str) else None
+    if not match:
+        return None
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+
+# Function to convert a 'HH:MM - HH:MM' string to (start, end) minutes, (-1, -1) for an empty string
+def time_range_minutes(value):
+    if value == '':
+        return -1, -1
+    match = TIME_RANGE_PATTERN.match(value) if isinstance(value, str) else None
+    if not match:
+        return None
+    hours_start, minutes_start, hours_end, minutes_end = (int(part) for part in match.groups())
+    return hours_start * 60 + minutes_start, hours_end * 60 + minutes_end
+
+
+# Function to look up a value per row from per-unique values, code -1 (missing) becomes None
+def take_codes(unique_values, codes):
+    lookup = np.array(list(unique_values) + [None], dtype=object)
+    return lookup[codes].tolist()
+
+
+# Function to dictionary-encode one column, optionally storing times as integer minutes
+def encode_column(series, serialize, kind=None):
+    if kind == 'time' and pd.api.types.is_integer_dtype(series):
+        # Already stored as minutes by the readers
+        return {'minutes': [None if pd.isna(value) else int(value) for value in series.tolist()]}
+
+    # Every distinct value is serialized once, rows only carry an integer code
+    codes, uniques = pd.factorize(series)
+    if kind == 'date':
+        values = [None if pd.isna(value) else value.strftime('%Y-%m-%d') for value in uniques]
+    else:
+        values = [serialize(value) for value in uniques]
+
+    if kind == 'time':
+        minutes = [time_minutes(value) for value in values]
+        if None not in minutes:
+            return {'minutes': take_codes(minutes, codes)}
+    elif kind == 'time_range':
+        ranges = [time_range_minutes(value) for value in values]
+        if None not in ranges:
+            return {
+                'start': take_codes([start for start, _ in ranges], codes),
+                'end': take_codes([end for _, end in ranges], codes),
+            }
+
+    return {'values': values, 'codes': codes.tolist()}
+
+
+# Function to encode a DataFrame as a columnar payload for decodeColumns in the page
+def encode_frame(df, serialize, time_columns=(), time_range_columns=(), date_columns=(), transforms=None):
+    """Encode df column by column.
+
+    serialize converts a cell to its JS-facing value and transforms holds extra
+    per-column conversions applied after it. Time columns holding integer minutes
+    or values that all look like 'HH:MM' (or 'HH:MM - HH:MM') are stored as
+    minutes, date columns as 'YYYY-MM-DD' strings and any other column as a table
+    of distinct values plus one code per row.
+    """
+    transforms = transforms or {}
+    columns = {}
+    for name in df.columns:
+        if name in time_columns:
+            kind = 'time'
+        elif name in time_range_columns:
+            kind = 'time_range'
+        elif name in date_columns:
+            kind = 'date'
+        else:
+            kind = None
+        transform = transforms.get(name)
+        column_serialize = (lambda value, transform=transform: transform(serialize(value))) if transform else serialize
+        columns[name] = encode_column(df[name], column_serialize, kind)
+    return {'length': len(df), 'columns': columns}
+
+
+# Function to get the JS-facing key of an index value
+def index_key(value):
+    return value.strftime('%Y-%m-%d') if isinstance(value, pd.Timestamp) else str(value)
+
+
+# Function to index the rows of a frame for the filters of the page
+def build_row_index(df, range_columns=(), list_columns=()):
+    """Map every value of the given columns to the rows holding it.
+
+    The frame must be sorted by the range columns, their values map to
+    [start, end) row offsets. The values of the list columns map to the
+    sorted row numbers holding them. Missing values are left out.
+    """
+    index = {}
+    for name in list(range_columns) + list(list_columns):
+        codes, uniques = pd.factorize(df[name])
+        # Group the row numbers by code, keeping them sorted within each group
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        groups = np.split(order[(codes < 0).sum():], np.cumsum(counts)[:-1]) if len(uniques) else []
+        if name in range_columns:
+            index[name] = {index_key(value): [int(rows[0]), int(rows[-1]) + 1] for value, rows in zip(uniques, groups)}
+        else:
+            index[name] = {index_key(value): rows.tolist() for value, rows in zip(uniques, groups)}
+    return index
+
@@ -0,0 +1,1432 @@
+import pandas as pd
+import numpy as np
+import json
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from types import GeneratorType
+
+from allocation import DAY_START_MINUTES, allocate_tasks, build_eligibility_index, time_to_minutes
+from assignment_store import SAVED_ASSIGNMENTS_FORMAT
+from export import FLIGHT_SCHEDULE_COLUMNS
+from instrumentation import span
+from jobs import report_progress
+from payload import DECODER_JS, build_row_index, encode_frame
+from schema import DERIVED_COLUMNS, compact_employees, compact_tasks, map_categories
+from staffing import build_staffing_grid, staffing_payload
+from store import sheet_fingerprints
+from timeline import timeline_lanes
+from workbook import (
+    DEFAULT_FILL,
+    TASK_DAYS,
+    StyleTable,
+    WorkbookData,
+    iter_sheet_rows,
+    load_workbook_data,
+    open_streaming_workbook,
+)
+
+# Progress and problems are reported through logging so the readers run without Streamlit;
+# the app forwards these records to the page
+logger = logging.getLogger(__name__)
+
+# Uploads larger than this are read with the bounded-memory streaming readers
+STREAMING_THRESHOLD_BYTES = 20 * 1024 * 1024
+
+EXCLUDED_COLORS = ['FFFF00', 'FF3B3B', '00FFFF', 'FFFFFF00', 'FFFF3B3B', 'FF00FFFF', 'FFA9D4']
+TRAINING_COLORS = ['33CCCC', 'FF33CCCC']
+
+# Number of distinct cell values remembered by the memoized shift and task time parsers
+PARSE_CACHE_SIZE = 4096
+
+# Function to safely serialize JSON data
+def json_serialize_safe(obj):
+    if pd.isna(obj):
+        return None
+    if isinstance(obj, (pd.Timestamp, pd.Timedelta)):
+        return str(obj)
+    return str(obj)
+
+# Function to clean location data
+def clean_location(location):
+    if not location:
+        return 'Unknown Location'
+    return re.sub(r'\s*\([A-Z]\)(?:\s*,\s*[^,\]]*)*', '', location)
+
+# Function to determine time period (dagdeel)
+def determine_dagdeel(shift_time):
+    try:
+        start_time = shift_time.split('-')[0].replace('+1', '')
+        hour = int(start_time.split(':')[0])
+        minute = int(start_time.split(':')[1])
+    except ValueError:
+        return 'Unknown'
+    
+    time_in_minutes = hour * 60 + minute
+    
+    if 300 <= time_in_minutes <= 540:  # 05:00-09:30
+        return 'Ochtend'
+    elif 541 <= time_in_minutes <= 690:  # 09:31-11:30
+        return 'Tussen'
+    elif 691 <= time_in_minutes <= 1170:  # 11:31-19:30
+        return 'Avond'
+    elif 1171 <= time_in_minutes <= 1500 or time_in_minutes < 299:  # 19:31-01:00+1 or 00:00-04:59
+        return 'Nacht'
+    else:
+        return 'Unknown'
+
+# Function to parse shift cell data
+def parse_shift_cell(cell_value):
+    if pd.isna(cell_value) or str(cell_value).strip() == '':
+        return None, None, None
+        
+    cell_value = str(cell_value).replace('_x000D_', '').strip()
+    
+    if not cell_value or cell_value.lower() == 'file':
+        return None, None, None
+    
+    if cell_value.startswith('[') and cell_value.endswith(']'):
+        location = clean_location(cell_value[1:-1])
+        return None, None, location
+    
+    match = re.match(r'(\d{2}:\d{2})(?:\+1)?-(\d{2}:\d{2})(?:\+1)?\s*(?:\[(.*?)\])?', cell_value)
+    
+    if not match:
+        return None, None, None
+    
+    start_time, end_time, location = match.groups()
+    location = clean_location(location)
+    
+    return start_time, end_time, location
+
+# Function to parse a shift cell into start, end, location and dagdeel, memoized per distinct value
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_shift(cell_value):
+    start_time, end_time, location = parse_shift_cell(cell_value)
+    dagdeel = determine_dagdeel(f"{start_time}-{end_time}") if start_time is not None else None
+    return start_time, end_time, location, dagdeel
+
+# Function to parse a column or grid of shift cells, parsing each distinct value only once
+def parse_shift_cells(values):
+    values = np.asarray(values, dtype=object)
+    codes, uniques = pd.factorize(values.ravel())
+    # Missing values are factorized to code -1, which picks the empty result appended last
+    parsed = np.empty((len(uniques) + 1, 4), dtype=object)
+    for i, value in enumerate(uniques):
+        parsed[i] = parse_shift(value)
+    parsed[-1] = (None, None, None, None)
+    parsed = parsed[codes]
+    return {
+        name: parsed[:, i].reshape(values.shape)
+        for i, name in enumerate(['Starttijd', 'Eindtijd', 'Locatie', 'Dagdeel'])
+    }
+
+# Function to check whether a fill colour marks a shift that should be skipped
+def is_excluded_color(cell_color):
+    return any(cell_color.endswith(color[-6:]) for color in EXCLUDED_COLORS)
+
+# Function to check whether a fill colour marks a training shift
+def is_training_color(cell_color):
+    return any(cell_color.endswith(color[-6:]) for color in TRAINING_COLORS)
+
+# Function to classify a fill colour, applied once per colour through StyleTable.classify
+def classify_color(cell_color):
+    if not cell_color:
+        return None
+    if is_excluded_color(cell_color):
+        return 'excluded'
+    if is_training_color(cell_color):
+        return 'training'
+    return 'normal'
+
+# Function to check whether a reader got the records of iter_employee_shifts or iter_daily_tasks.
+# Paths, open files and BytesIO uploads are workbooks, file objects are iterators too so only
+# the generators count as record streams.
+def is_record_stream(source):
+    return isinstance(source, GeneratorType)
+
+# Function to stream shift records from the Medewerkers sheet one row at a time
+def iter_employee_shifts(file_path):
+    wb = open_streaming_workbook(file_path)
+    try:
+        styles = StyleTable(wb)
+        color_classes = styles.classify(classify_color)
+        # Row count from the stored dimensions, only used to show progress
+        total_rows = wb['Medewerkers'].max_row if 'Medewerkers' in wb.sheetnames else None
+        dates = {}
+        for row_number, (values, fills) in enumerate(iter_sheet_rows(wb, 'Medewerkers', styles)):
+            report_progress('Medewerkers row', row_number + 1, total_rows)
+            # Row 8 holds the dates, employees start on the row below
+            if row_number == 7:
+                for col in range(3, len(values)):
+                    if not pd.isna(values[col]):
+                        date = pd.to_datetime(values[col], format='%d-%m-%Y')
+                        dates[col] = (date.strftime('%A'), date.strftime('%Y-%m-%d'))
+                continue
+            
+            if row_number < 8 or not values or pd.isna(values[0]):
+                continue
+            
+            values = values + [np.nan] * (3 - len(values))
+            employee = f"{str(values[0])} {str(values[1])}".strip()
+            function = str(values[2])
+            
+            for col, (day_name, date_string) in dates.items():
+                if col >= len(values):
+                    break
+                
+                cell_value = values[col]
+                cell_color = (fills[col] if col < len(fills) else DEFAULT_FILL) or None
+                color_class = color_classes.get(cell_color)
+                
+                if color_class is None or color_class == 'excluded':
+                    continue
+                    
+                if pd.isna(cell_value) or cell_value == '':
+                    continue
+                
+                is_training = color_class == 'training'
+                
+                start_time, end_time, location, dagdeel = parse_shift(cell_value)
+                if start_time is None:
+                    continue
+                
+                # Skip training shifts that start at 08:30 or 09:00
+                if is_training and start_time in ['08:30', '09:00']:
+                    continue
+                
+                yield {
+                    'Medewerkers': employee,
+                    'DefaultTask': 'Meelopen' if is_training else None,
+                    'Functie': function,
+                    'Dag': day_name,
+                    'Datum': date_string,
+                    'Starttijd': start_time,
+                    'Eindtijd': end_time,
+                    'Locatie': location,
+                    'Dagdeel': dagdeel,
+                    'CellColor': cell_color,
+                    'IsTrainee': is_training
+                }
+    finally:
+        wb.close()
+
+# Function to read employee schedule from Excel
+def read_employee_schedule(file_path):
+    try:
+        if is_record_stream(file_path):
+            # Records streamed by iter_employee_shifts arrive per employee row,
+            # restore the date-major order of the sheet
+            employees_df = pd.DataFrame(list(file_path))
+            logger.info(f"Total processed records: {len(employees_df)}")
+            if employees_df.empty:
+                return employees_df
+            return compact_employees(employees_df.sort_values('Datum', kind='stable', ignore_index=True))
+        
+        workbook = load_workbook_data(file_path)
+        report_progress('Medewerkers')
+        sheet = workbook['Medewerkers']
+        
+        df = sheet.values
+        logger.info(f"Total columns in sheet: {df.shape[1]}")
+        
+        date_row = df.iloc[7]
+        
+        # Schedule columns are the ones with a date in the date row
+        date_cols = [col for col in range(3, df.shape[1]) if not pd.isna(date_row[col])]
+        dates = [pd.to_datetime(date_row[col], format='%d-%m-%Y') for col in date_cols]
+        
+        # Employee rows start below the date row and need a first name
+        employee_rows = [row for row in range(8, df.shape[0]) if not pd.isna(df.iloc[row, 0])]
+        
+        # Value and fill grids (employee rows x date columns), flattened column by column
+        # so records come out in the same date-major order as the sheet
+        values = df.to_numpy(dtype=object)[np.ix_(employee_rows, date_cols)].ravel(order='F')
+        fills = sheet.fill_array(*df.shape)[np.ix_(employee_rows, date_cols)].ravel(order='F')
+        row_index = np.tile(np.arange(len(employee_rows)), len(date_cols))
+        col_index = np.repeat(np.arange(len(date_cols)), len(employee_rows))
+        
+        # Classify each distinct fill colour through the workbook's style table;
+        # None (no colour) is factorized to code -1
+        color_classes = workbook.styles.classify(classify_color)
+        color_codes, unique_colors = pd.factorize(fills)
+        unique_classes = np.array([color_classes.get(color) for color in unique_colors] + [None], dtype=object)
+        cell_classes = unique_classes[color_codes]
+        has_color = pd.notna(cell_classes)
+        is_excluded = cell_classes == 'excluded'
+        is_training = cell_classes == 'training'
+        
+        is_empty = pd.isna(values) | (values == '')
+        candidates = np.flatnonzero(has_color & ~is_excluded & ~is_empty)
+        
+        shifts = parse_shift_cells(values[candidates])
+        start_times = shifts['Starttijd']
+        
+        # Skip unparseable cells and training shifts that start at 08:30 or 09:00
+        keep = pd.notna(start_times)
+        keep &= ~(is_training[candidates] & np.isin(start_times, ['08:30', '09:00']))
+        
+        cells = candidates[keep]
+        rows = row_index[cells]
+        cols = col_index[cells]
+        trainee = is_training[cells]
+        
+        # Labels are computed once per employee row and date column and picked per record,
+        # compact_employees turns them into categoricals
+        names = np.array([f"{str(df.iloc[row, 0])} {str(df.iloc[row, 1])}".strip() for row in employee_rows], dtype=object)
+        functions = np.array([str(df.iloc[row, 2]) for row in employee_rows], dtype=object)
+        day_names = np.array([date.strftime('%A') for date in dates], dtype=object)
+        
+        logger.info(f"Total processed records: {len(cells)}")
+        if len(cells) == 0:
+            return pd.DataFrame()
+        
+        return compact_employees(pd.DataFrame({
+            'Medewerkers': names[rows],
+            'DefaultTask': np.where(trainee, 'Meelopen', None),  # Changed from 'Training / Meelopen'
+            'Functie': functions[rows],
+            'Dag': day_names[cols],
+            'Datum': pd.DatetimeIndex(dates)[cols],
+            'Starttijd': shifts['Starttijd'][keep],
+            'Eindtijd': shifts['Eindtijd'][keep],
+            'Locatie': shifts['Locatie'][keep],
+            'Dagdeel': shifts['Dagdeel'][keep],
+            'CellColor': fills[cells],
+            'IsTrainee': trainee  # Flag to identify trainees for UI interactions
+        }))
+        
+    except Exception as e:
+        logger.error(f"Error reading employee schedule: {str(e)}")
+        raise
+
+# Function to determine the task period from its start time
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def determine_period(start_time):
+    if not start_time:
+        return ''
+    time_in_minutes = time_to_minutes(start_time)
+    if time_in_minutes is None:
+        return ''
+    # Nacht ends at DAY_START_MINUTES, where task_window stops moving tasks to the night
+    if time_in_minutes >= 1320 or time_in_minutes < DAY_START_MINUTES:  # 22:00-04:59
+        return 'Nacht'
+    elif time_in_minutes < 840:  # 05:00-13:59
+        return 'Ochtend'
+    else:  # 14:00-21:59
+        return 'Avond'
+
+# Function to normalise a task time cell to 'HH:MM', '' when empty
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_task_time(value):
+    if pd.isna(value):
+        return ''
+    time = str(value)
+    return ':'.join(time.split(':')[:2]) if time else ''  # Only HH:MM
+
+# Function to parse the start and end time columns of a Taken sheet, each distinct value once
+def parse_task_times(start_values, end_values):
+    start_codes, start_uniques = pd.factorize(np.asarray(start_values, dtype=object))
+    end_codes, end_uniques = pd.factorize(np.asarray(end_values, dtype=object))
+    
+    # Missing values are factorized to code -1, which picks the '' appended last
+    start_times = np.array([parse_task_time(value) for value in start_uniques] + [''], dtype=object)
+    end_times = np.array([parse_task_time(value) for value in end_uniques] + [''], dtype=object)
+    periods = np.array([determine_period(start_time) for start_time in start_times], dtype=object)
+    
+    return list(zip(start_times[start_codes], end_times[end_codes], periods[start_codes]))
+
+# Function to build a task record from the values of one Taken row,
+# times holds the (start, end, period) from parse_task_times when already parsed.
+# The record carries its TaskKey, number_task turns it into the unique TaskId.
+def build_task(values, cell_color, day, times=None):
+    if pd.isna(values[0]):
+        return None
+    
+    cell_color = cell_color or None
+    
+    # Get task name from column A
+    task_desc = str(values[0]).strip()
+    if pd.isna(task_desc) or task_desc == '':
+        return None
+    
+    parts = task_desc.split('\n')
+    task_name = parts[0].strip()
+    
+    # Get function from column B
+    function = str(values[1]) if not pd.isna(values[1]) else ''
+    
+    if times is None:
+        # Get start and end time from columns C and D, period from the start time
+        start_time = parse_task_time(values[2])
+        end_time = parse_task_time(values[3])
+        period = determine_period(start_time)
+    else:
+        start_time, end_time, period = times
+    
+    # Get location from column F
+    location = str(values[5]) if not pd.isna(values[5]) else ''
+    
+    return {
+        'TaskName': task_name,
+        'Function': function,
+        'Time': f"{start_time} - {end_time}" if start_time and end_time else '',
+        'Locatie': location,
+        'Day': day,
+        'Dagdeel': period,
+        'CellColor': cell_color,
+        # Create a unique task key for counting
+        'TaskKey': f"{task_name}_{start_time}_{end_time}_{period}"
+    }
+
+# Function to give a task its unique TaskId, counting repeats of its key across the week
+def number_task(task, task_counters):
+    task_key = task.pop('TaskKey')
+    
+    # Update counter for this task key
+    if task_key not in task_counters:
+        task_counters[task_key] = 0
+    else:
+        task_counters[task_key] += 1
+    
+    # Create unique task identifier including the counter
+    task['TaskId'] = f"{task_key}_{task_counters[task_key]}"
+    
+    if task['TaskName'] and task['TaskName'] != 'nan':
+        return task
+    return None
+
+# Function to number a DataFrame of tasks in week order, the vectorized form of number_task
+def number_tasks(tasks_df):
+    if tasks_df.empty:
+        return pd.DataFrame()
+    
+    counters = tasks_df.groupby('TaskKey', sort=False).cumcount()
+    tasks_df = tasks_df.assign(TaskId=tasks_df['TaskKey'] + '_' + counters.astype(str))
+    keep = (tasks_df['TaskName'] != '') & (tasks_df['TaskName'] != 'nan')
+    return tasks_df[keep].drop(columns='TaskKey').reset_index(drop=True)
+
+# Function to yield the un-numbered task records of one Taken sheet from a streaming workbook
+def iter_day_tasks(wb, day, styles=None):
+    rows = iter_sheet_rows(wb, f'Taken {day}', styles)
+    total_rows = wb[f'Taken {day}'].max_row
+    # Skip the header row
+    next(rows, None)
+    
+    for row_number, (values, fills) in enumerate(rows, start=2):
+        report_progress(f'Taken {day} row', row_number, total_rows)
+        values = values + [np.nan] * (6 - len(values))
+        cell_color = fills[0] if fills else DEFAULT_FILL
+        task = build_task(values, cell_color, day)
+        if task:
+            yield task
+
+# Function to stream task records from the Taken sheets one row at a time
+def iter_daily_tasks(file_path):
+    wb = open_streaming_workbook(file_path)
+    try:
+        # Initialize task counters for unique ID generation
+        task_counters = {}
+        styles = StyleTable(wb)
+        
+        for day in TASK_DAYS:
+            try:
+                for task in iter_day_tasks(wb, day, styles):
+                    task = number_task(task, task_counters)
+                    if task:
+                        yield task
+                        
+            except Exception as e:
+                logger.warning(f"Error reading {day} tasks: {str(e)}")
+                continue
+    finally:
+        wb.close()
+
+# Function to collect the un-numbered tasks of one Taken sheet with the error that stopped reading it
+def collect_day_tasks(wb, day, styles=None):
+    tasks = []
+    try:
+        for task in iter_day_tasks(wb, day, styles):
+            tasks.append(task)
+    except Exception as e:
+        return tasks, str(e)
+    return tasks, None
+
+# Function to parse one Taken sheet in a worker process
+def parse_day_tasks(file_path, day):
+    wb = open_streaming_workbook(file_path)
+    try:
+        return collect_day_tasks(wb, day)
+    finally:
+        wb.close()
+
+# Function to parse Taken sheets, on a pool of worker processes when workers > 1.
+# Returns (tasks, error) per day in the order of days, whichever sheet finishes first.
+def parse_task_sheets(file_path, days, workers=None):
+    if not days:
+        return []
+    if workers and workers > 1 and len(days) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(days))) as executor:
+            return list(executor.map(parse_day_tasks, repeat(file_path), days))
+    
+    wb = open_streaming_workbook(file_path)
+    try:
+        styles = StyleTable(wb)
+        return [collect_day_tasks(wb, day, styles) for day in days]
+    finally:
+        wb.close()
+
+# Function to put the day fragments back together in week order and number their tasks
+def merge_day_tasks(fragments):
+    fragments = [fragment for fragment in fragments if not fragment.empty]
+    return number_tasks(pd.concat(fragments, ignore_index=True)) if fragments else pd.DataFrame()
+
+# Function to sort the tasks by period and then function
+def sort_tasks(df_tasks):
+    period_order = {'Ochtend': 1, 'Avond': 2, 'Nacht': 3}
+    function_order = {'CC': 1, 'TL': 2, 'DC': 3, 'A': 4, 'B': 5, 'C': 6, 'D': 7, 'E+': 8, 'E': 9}
+    
+    if not df_tasks.empty:
+        # First sort by period
+        df_tasks['PeriodOrder'] = df_tasks['Dagdeel'].map(period_order)
+        # Then by function
+        df_tasks['FunctionOrder'] = df_tasks['Function'].map(function_order)
+        
+        # Sort by period first, then function
+        df_tasks = df_tasks.sort_values(['PeriodOrder', 'FunctionOrder'])
+        
+        # Remove helper columns but keep TaskId to maintain uniqueness
+        df_tasks = df_tasks.drop(['PeriodOrder', 'FunctionOrder'], axis=1)
+    
+    return df_tasks
+
+# Function to read daily tasks from Excel,
+# with workers > 1 the day sheets of a workbook file are parsed on a process pool
+def read_daily_tasks(file_path, workers=None):
+    days = TASK_DAYS
+    
+    if workers and not is_record_stream(file_path) and not isinstance(file_path, WorkbookData):
+        # Tasks are numbered after the merge, so the TaskIds do not depend on which sheet finished first
+        fragments = []
+        for day, (tasks, error) in zip(days, parse_task_sheets(file_path, days, workers)):
+            if error is not None:
+                logger.warning(f"Error reading {day} tasks: {error}")
+            fragments.append(pd.DataFrame(tasks))
+        return compact_tasks(sort_tasks(merge_day_tasks(fragments)))
+    
+    if is_record_stream(file_path):
+        # Task records streamed by iter_daily_tasks
+        all_tasks = list(file_path)
+    else:
+        all_tasks = []
+        
+        # Initialize task counters for unique ID generation
+        task_counters = {}
+        
+        workbook = load_workbook_data(file_path)
+        
+        for day in days:
+            report_progress(f'Taken {day}')
+            try:
+                sheet = workbook[f'Taken {day}']
+                df = sheet.values
+                if not df.empty:
+                    start_row = 2
+                    
+                    # Parse the time columns in one batch, a too narrow sheet fails per row below
+                    times = parse_task_times(df.iloc[:, 2], df.iloc[:, 3]) if df.shape[1] > 3 else None
+                    
+                    for position, (idx, row) in enumerate(df.iterrows()):
+                        cell_color = sheet.fill(start_row + idx, 1)
+                        row_times = times[position] if times else None
+                        task = build_task(row.tolist(), cell_color, day, row_times)
+                        if task:
+                            task = number_task(task, task_counters)
+                        if task:
+                            all_tasks.append(task)
+                    
+            except Exception as e:
+                logger.warning(f"Error reading {day} tasks: {str(e)}")
+                continue
+    
+    # Create DataFrame and sort
+    df_tasks = pd.DataFrame(all_tasks) if all_tasks else pd.DataFrame()
+    return compact_tasks(sort_tasks(df_tasks))
+
+# Function to group assignments by employee and date, keyed like taskAssignmentsByEmployee in the page
+def assignments_by_employee(assignments_df):
+    grouped = {}
+    for assignment in assignments_df.itertuples(index=False):
+        key = f"{assignment.Medewerkers}-{pd.Timestamp(assignment.Datum):%Y-%m-%d}"
+        grouped.setdefault(key, []).append(assignment.TaskId)
+    return grouped
+
+# Function to generate HTML content,
+# saved_assignments_df holds assignments from an AssignmentStore that the page starts with,
+# roster names the roster in the saved assignments file the page downloads
+def generate_html(employees_df, tasks_df, assignments_df=None, saved_assignments_df=None, roster=''):
+    period_order = {'Ochtend': 1, 'Tussen': 2, 'Avond': 3, 'Nacht': 4}
+    
+    # Dagdeel is ordered through its categories, the other keys sort on their categorical codes
+    sorted_df = employees_df.sort_values(
+        by=['Datum', 'Dagdeel', 'Functie'], 
+        key=lambda x: pd.Series(map_categories(x, period_order), index=x.index) if x.name == 'Dagdeel' else x
+    )
+    
+    def convert_color(color):
+        if not color or color == 'FFFFFFFF':
+            return None
+        return f'#{color[2:]}' if color.startswith('FF') else f'#{color}'
+    
+    # Columnar payloads: repeated strings are interned per column and times stored as minutes,
+    # decodeColumns in the page rebuilds the record objects
+    with span('encode_payload') as stage:
+        employees_payload = encode_frame(
+            sorted_df.drop(columns=DERIVED_COLUMNS, errors='ignore'), json_serialize_safe,
+            time_columns=['Starttijd', 'Eindtijd'],
+            date_columns=['Datum'],
+            transforms={'CellColor': convert_color}
+        )
+        tasks_payload = encode_frame(
+            tasks_df.drop(columns=DERIVED_COLUMNS, errors='ignore'), json_serialize_safe,
+            time_range_columns=['Time'],
+            transforms={'CellColor': lambda color: convert_color(color) if color else color}
+        )
+        stage.rows = len(sorted_df) + len(tasks_df)
+
+    # Row indexes for the filters: sorted_df is ordered by Datum, so a date maps to one
+    # [start, end) range of the decoded records and the other values to sorted row numbers
+    with span('build_filter_index') as stage:
+        schedule_index = build_row_index(sorted_df, range_columns=['Datum'], list_columns=['Locatie', 'Dagdeel'])
+        tasks_index = build_row_index(tasks_df, list_columns=['Day', 'Dagdeel', 'Locatie']) if not tasks_df.empty else {}
+        # Tasks are listed per weekday, the page selects them by date
+        schedule_index['Day'] = {
+            date: TASK_DAYS[pd.Timestamp(date).dayofweek] for date in schedule_index.get('Datum', {})
+        }
+        stage.rows = len(sorted_df) + len(tasks_df)
+
+    # Timeline lanes per date and location, the page only positions the bars
+    with span('timeline_lanes') as stage:
+        timeline = timeline_lanes(sorted_df)
+        stage.rows = len(sorted_df)
+
+    # Headcount against task demand per 15-minute slot, drawn as a heatmap for the selected date
+    with span('staffing_grid') as stage:
+        staffing = staffing_payload(build_staffing_grid(employees_df, tasks_df))
+        stage.rows = len(staffing['dates']) * len(staffing['locations'])
+
+    # Precompute the auto-allocation server side, keyed like taskAssignmentsByEmployee
+    with span('allocate_tasks') as stage:
+        if assignments_df is None:
+            assignments_df = allocate_tasks(employees_df, tasks_df)
+        precomputed_assignments = assignments_by_employee(assignments_df)
+        saved_assignments = assignments_by_employee(saved_assignments_df) if saved_assignments_df is not None else {}
+
+        # Function eligibility is computed once here instead of per employee/task pair in the page
+        eligibility_index = build_eligibility_index(employees_df, tasks_df)
+        stage.rows = len(assignments_df)
+
+    with span('serialize_json'):
+        employees_json = json.dumps(employees_payload, separators=(',', ':'))
+        tasks_json = json.dumps(tasks_payload, separators=(',', ':'))
+        assignments_json = json.dumps(precomputed_assignments)
+        saved_assignments_json = json.dumps(saved_assignments)
+        eligibility_json = json.dumps(eligibility_index)
+        schedule_index_json = json.dumps(schedule_index, separators=(',', ':'))
+        tasks_index_json = json.dumps(tasks_index, separators=(',', ':'))
+        staffing_json = json.dumps(staffing, separators=(',', ':'))
+        timeline_json = json.dumps(timeline, separators=(',', ':'))
+        roster_json = json.dumps(roster)
+        flight_schedule_columns_json = json.dumps(FLIGHT_SCHEDULE_COLUMNS)
+
+    # Generate the HTML content with modified JavaScript initialization
+    html_content = f"""
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>Weekly Task Allocation</title>
+    <style>
+        /* Your existing CSS styles */
+        body {{ 
+            font-family: Arial, sans-serif;
+            margin: 0;
+            padding: 5pt;
+            box-sizing: border-box;
+        }}
+        
+        .staffing-heatmap {{
+            border-collapse: collapse;
+            font-size: 9pt;
+            margin-bottom: 8pt;
+        }}
+        .staffing-heatmap th {{
+            font-weight: normal;
+            text-align: left;
+            white-space: nowrap;
+            padding-right: 4pt;
+        }}
+        .staffing-heatmap td {{
+            width: 6px;
+            height: 14px;
+            padding: 0;
+            border-left: 1px solid #eee;
+        }}
+        
+        /* Rest of your CSS styles */
+    </style>
+</head>
+<body>
+<!-- Updated header row with title and reordered action buttons -->
+<div class="header-row">
+    <h1>Weekly Task Allocation</h1>
+    <div class="action-buttons">
+        <button id="printPlanningButton" class="action-button print-button">
+            Print Planning
+        </button>
+        <button id="exportFlightScheduleButton" class="action-button export-button">
+            Export Flight Schedule
+        </button>
+        <button id="timelineViewButton" class="action-button timeline-button">
+            Timeline-view
+        </button>
+        <button id="autoAllocateButton" class="action-button auto-allocate-button">
+            <span id="allocateSpinner" class="spinner"></span>
+            Auto-Allocate Tasks
+        </button>
+        <button id="unassignAllButton" class="action-button unassign-button">
+            Unassign Tasks
+        </button>
+        <button id="saveAssignmentsButton" class="action-button save-button">
+            Save Assignments
+        </button>
+    </div>
+</div>
+    
+    <div class="filters">
+        <span class="filter-label">Date:</span>
+        <select id="dateFilter">
+            <option value="all">All Dates</option>
+        </select>
+        
+        <span class="filter-label">Location:</span>
+        <select id="locationFilter">
+            <option value="all">All Locations</option>
+        </select>
+        
+        <span class="filter-label">Period:</span>
+        <select id="periodFilter">
+            <option value="all">All Periods</option>
+            <option value="Ochtend">Ochtend</option>
+            <option value="Tussen">Tussen</option>
+            <option value="Avond">Avond</option>
+            <option value="Nacht">Nacht</option>
+        </select>
+    </div>
+
+    <div class="staffing-heatmap-container" id="staffingHeatmap"></div>
+
+    <div class="page-container" id="pageContainer"></div>
+
+<script>
+        (function() {{
+{DECODER_JS}
+            const scheduleData = decodeColumns({employees_json});
+            const tasksData = decodeColumns({tasks_json});
+            const precomputedAssignments = {assignments_json};
+            const savedAssignments = {saved_assignments_json};
+            const eligibilityIndex = {eligibility_json};
+            const scheduleIndex = {schedule_index_json};
+            const tasksIndex = {tasks_index_json};
+            const staffingData = {staffing_json};
+            const timelineData = {timeline_json};
+            const rosterName = {roster_json};
+            const flightScheduleColumns = {flight_schedule_columns_json};
+            const taskAssignmentsByEmployee = new Map();
+            let isUpdating = false;
+            let currentView = 'list';
+
+            // MODIFIED: Replace DOMContentLoaded with an init function and window.onload
+            function initializeApp() {{
+                console.log('Initializing app directly');
+                
+                const uniqueDates = Object.keys(scheduleIndex.Datum || {{}}).sort();
+                const uniqueLocations = Object.keys(scheduleIndex.Locatie || {{}}).sort();
+
+                const dateFilter = document.getElementById('dateFilter');
+                const locationFilter = document.getElementById('locationFilter');
+                const periodFilter = document.getElementById('periodFilter');
+
+                uniqueDates.forEach(date => {{
+                    const option = document.createElement('option');
+                    option.value = date;
+                    option.textContent = date;
+                    dateFilter.appendChild(option);
+                }});
+
+                uniqueLocations.forEach(location => {{
+                    const option = document.createElement('option');
+                    option.value = location;
+                    option.textContent = location;
+                    locationFilter.appendChild(option);
+                }});
+
+                if (uniqueDates.length > 0) {{
+                    dateFilter.value = uniqueDates[0];
+                }}
+
+                // Start from the assignments saved for these dates, skipping tasks that no longer exist
+                const tasksById = new Map(tasksData.map(task => [task.TaskId, task]));
+                for (const [key, taskIds] of Object.entries(savedAssignments)) {{
+                    const tasks = taskIds.map(taskId => tasksById.get(taskId)).filter(Boolean);
+                    if (tasks.length > 0) {{
+                        taskAssignmentsByEmployee.set(key, tasks);
+                    }}
+                }}
+
+                dateFilter.addEventListener('change', updateDisplay);
+                locationFilter.addEventListener('change', updateDisplay);
+                periodFilter.addEventListener('change', updateDisplay);
+                
+                // Add event listeners for all action buttons
+                document.getElementById('autoAllocateButton').addEventListener('click', autoAllocateTasks);
+                
+                document.getElementById('exportFlightScheduleButton').addEventListener('click', exportFlightSchedule);
+                
+                document.getElementById('timelineViewButton').addEventListener('click', showTimelineView);
+                
+                document.getElementById('saveAssignmentsButton').addEventListener('click', saveAssignments);
+                
+                document.getElementById('printPlanningButton').addEventListener('click', function() {{
+                    createPrintModal();
+                }});
+                
+                // Add event listener for the unassign all button
+                document.getElementById('unassignAllButton').addEventListener('click', function() {{
+                    // Get the current date, location, and period filter values
+                    const selectedDate = document.getElementById('dateFilter').value;
+                    const selectedLocation = document.getElementById('locationFilter').value;
+                    const selectedPeriod = document.getElementById('periodFilter').value;
+                    
+                    if (selectedDate === 'all') {{
+                        alert('Please select a specific date first');
+                        return;
+                    }}
+                    
+                    // Confirm the user wants to unassign all tasks
+                    if (confirm('Are you sure you want to unassign all tasks for the current selection?')) {{
+                        // Get all employees matching the filters
+                        const filteredEmployees = selectEmployees(selectedDate, selectedLocation, selectedPeriod);
+                        
+                        // Clear all task assignments for the filtered employees
+                        for (const employee of filteredEmployees) {{
+                            const key = `${{employee.Medewerkers}}-${{employee.Datum}}`;
+                            if (taskAssignmentsByEmployee.has(key)) {{
+                                taskAssignmentsByEmployee.delete(key);
+                            }}
+                        }}
+                        
+                        // Update the display
+                        updateDisplay();
+                        
+                        // Show confirmation
+                        alert('All tasks have been unassigned for the current selection.');
+                    }}
+                }});
+                
+                // Set up global event delegation for task return buttons
+                document.addEventListener('click', function(e) {{
+                    // Check if the clicked element is a return button
+                    if (e.target.classList.contains('task-return-button')) {{
+                        e.preventDefault();
+                        e.stopPropagation();
+                        
+                        const taskId = e.target.getAttribute('data-task-id');
+                        const date = e.target.getAttribute('data-date');
+                        const employeeId = e.target.getAttribute('data-employee');
+                        
+                        console.log(`Unassigning task via delegation: ${{taskId}} from ${{employeeId}} on ${{date}}`);
+                        unassignTask(date, taskId, employeeId);
+                    }}
+                }});
+                
+                // Call updateDisplay with a slight delay to ensure DOM is ready
+                setTimeout(updateDisplay, 100);
+            }}
+
+            // Index of the first value in the sorted array rows that is not below value
+            function lowerBound(rows, value) {{
+                let low = 0, high = rows.length;
+                while (low < high) {{
+                    const middle = (low + high) >> 1;
+                    if (rows[middle] < value) low = middle + 1; else high = middle;
+                }}
+                return low;
+            }}
+
+            // Row numbers present in both sorted arrays
+            function intersectSorted(left, right) {{
+                const rows = [];
+                let i = 0, j = 0;
+                while (i < left.length && j < right.length) {{
+                    if (left[i] < right[j]) i++;
+                    else if (left[i] > right[j]) j++;
+                    else {{ rows.push(left[i]); i++; j++; }}
+                }}
+                return rows;
+            }}
+
+            // Row numbers of data matching every filter value that is not 'all'. A date narrows the
+            // search to its [start, end) range, the other filters intersect their row lists.
+            function selectRowNumbers(length, index, rangeFilter, listFilters) {{
+                let start = 0, end = length;
+                if (rangeFilter && rangeFilter[1] !== 'all') {{
+                    const range = (index[rangeFilter[0]] || {{}})[rangeFilter[1]];
+                    if (!range) return [];
+                    [start, end] = range;
+                }}
+                let rows = null;
+                for (const [column, value] of listFilters) {{
+                    if (value === 'all') continue;
+                    const valueRows = (index[column] || {{}})[value] || [];
+                    const candidates = valueRows.slice(lowerBound(valueRows, start), lowerBound(valueRows, end));
+                    rows = rows === null ? candidates : intersectSorted(rows, candidates);
+                }}
+                if (rows === null) {{
+                    rows = new Array(end - start);
+                    for (let row = start; row < end; row++) rows[row - start] = row;
+                }}
+                return rows;
+            }}
+
+            // Row numbers in either of two sorted arrays without shared rows, in order
+            function mergeSorted(left, right) {{
+                const rows = [];
+                let i = 0, j = 0;
+                while (i < left.length || j < right.length) {{
+                    if (j >= right.length || (i < left.length && left[i] < right[j])) rows.push(left[i++]);
+                    else rows.push(right[j++]);
+                }}
+                return rows;
+            }}
+
+            // Rows of data matching the filters, see selectRowNumbers
+            function selectRows(data, index, rangeFilter, listFilters) {{
+                return selectRowNumbers(data.length, index, rangeFilter, listFilters).map(row => data[row]);
+            }}
+
+            // Row numbers in scheduleData of the shifts of the selected date, location and period
+            function selectEmployeeRows(date, location, period) {{
+                return selectRowNumbers(scheduleData.length, scheduleIndex, ['Datum', date], [['Locatie', location], ['Dagdeel', period]]);
+            }}
+
+            // Shifts of the selected date, location and period
+            function selectEmployees(date, location, period) {{
+                return selectEmployeeRows(date, location, period).map(row => scheduleData[row]);
+            }}
+
+            // Tasks of the weekday of the selected date, location and period. Tasks without a
+            // location can be done at any location, so they are listed for every location.
+            function selectTasks(date, location, period) {{
+                const day = date === 'all' ? 'all' : (scheduleIndex.Day[date] || null);
+                if (day === null) return [];
+                let rows = selectRowNumbers(tasksData.length, tasksIndex, null, [['Day', day], ['Dagdeel', period]]);
+                if (location !== 'all') {{
+                    const locations = tasksIndex.Locatie || {{}};
+                    rows = intersectSorted(rows, mergeSorted(locations[location] || [], locations[''] || []));
+                }}
+                return rows.map(row => tasksData[row]);
+            }}
+
+            // Render a fixed row height list into container, creating elements only for the rows
+            // scrolled into view (plus a few around them) so long rosters stay responsive
+            function createVirtualList(container, items, rowHeight, renderRow) {{
+                const overscan = 8;
+                const viewport = document.createElement('div');
+                viewport.className = 'virtual-list';
+                viewport.style.cssText = 'overflow-y: auto; max-height: 70vh; position: relative;';
+                const spacer = document.createElement('div');
+                spacer.style.cssText = `position: relative; height: ${{items.length * rowHeight}}px;`;
+                viewport.appendChild(spacer);
+                container.appendChild(viewport);
+
+                let first = -1, last = -1, scheduled = false;
+                function render() {{
+                    scheduled = false;
+                    const visible = viewport.clientHeight || window.innerHeight;
+                    const start = Math.max(0, Math.floor(viewport.scrollTop / rowHeight) - overscan);
+                    const end = Math.min(items.length, Math.ceil((viewport.scrollTop + visible) / rowHeight) + overscan);
+                    if (start === first && end === last) return;
+                    first = start;
+                    last = end;
+                    const fragment = document.createDocumentFragment();
+                    for (let i = start; i < end; i++) {{
+                        const row = renderRow(items[i], i);
+                        row.style.position = 'absolute';
+                        row.style.left = '0';
+                        row.style.right = '0';
+                        row.style.top = `${{i * rowHeight}}px`;
+                        row.style.height = `${{rowHeight}}px`;
+                        fragment.appendChild(row);
+                    }}
+                    spacer.replaceChildren(fragment);
+                }}
+                viewport.addEventListener('scroll', function() {{
+                    if (!scheduled) {{
+                        scheduled = true;
+                        requestAnimationFrame(render);
+                    }}
+                }});
+                render();
+                return viewport;
+            }}
+
+            // Re-render the page for the current filter values
+            function updateDisplay() {{
+                if (isUpdating) return;
+                isUpdating = true;
+                try {{
+                    const selectedDate = document.getElementById('dateFilter').value;
+                    const selectedLocation = document.getElementById('locationFilter').value;
+                    const selectedPeriod = document.getElementById('periodFilter').value;
+                    renderStaffingHeatmap(selectedDate, selectedLocation);
+                    if (currentView === 'timeline') {{
+                        renderTimeline(selectedDate, selectEmployeeRows(selectedDate, selectedLocation, selectedPeriod));
+                    }} else {{
+                        renderContent(
+                            selectEmployees(selectedDate, selectedLocation, selectedPeriod),
+                            selectTasks(selectedDate, selectedLocation, selectedPeriod),
+                            selectEmployees(selectedDate, 'all', 'all')
+                        );
+                    }}
+                }} finally {{
+                    isUpdating = false;
+                }}
+            }}
+
+            // Draw staff minus task demand per slot of the selected date, one row per location:
+            // red slots are short of staff, green ones have staff to spare
+            function renderStaffingHeatmap(date, location) {{
+                const container = document.getElementById('staffingHeatmap');
+                container.replaceChildren();
+                const dateIndex = staffingData.dates.indexOf(date);
+                if (dateIndex < 0) return;
+
+                const slots = 1440 / staffingData.slotMinutes;
+                const slotsPerHour = 60 / staffingData.slotMinutes;
+                const table = document.createElement('table');
+                table.className = 'staffing-heatmap';
+                const header = table.insertRow();
+                header.appendChild(document.createElement('th'));
+                for (let hour = 0; hour < 24; hour++) {{
+                    const cell = document.createElement('th');
+                    cell.colSpan = slotsPerHour;
+                    cell.textContent = String(hour).padStart(2, '0');
+                    header.appendChild(cell);
+                }}
+
+                // The first row totals every location, tasks without a location only count there
+                const offset = dateIndex * slots;
+                const rows = [['All locations', staffingData.locations.map((name, position) => position)]];
+                staffingData.locations.forEach(function(name, position) {{
+                    if (name !== '' && (location === 'all' || name === location)) rows.push([name, [position]]);
+                }});
+                for (const [name, positions] of rows) {{
+                    const row = table.insertRow();
+                    const label = document.createElement('th');
+                    label.textContent = name;
+                    row.appendChild(label);
+                    for (let slot = 0; slot < slots; slot++) {{
+                        let supply = 0, demand = 0;
+                        for (const position of positions) {{
+                            supply += staffingData.supply[position][offset + slot];
+                            demand += staffingData.demand[position][offset + slot];
+                        }}
+                        const gap = supply - demand;
+                        const cell = row.insertCell();
+                        if (gap < 0) {{
+                            cell.style.backgroundColor = `rgba(220, 53, 69, ${{Math.min(1, 0.25 - gap * 0.15)}})`;
+                        }} else if (gap > 0) {{
+                            cell.style.backgroundColor = `rgba(40, 167, 69, ${{Math.min(0.6, gap * 0.06)}})`;
+                        }}
+                        const minutes = slot * staffingData.slotMinutes;
+                        const time = `${{String(Math.floor(minutes / 60)).padStart(2, '0')}}:${{String(minutes % 60).padStart(2, '0')}}`;
+                        cell.title = `${{time}}: ${{supply}} staff, ${{demand}} tasks`;
+                    }}
+                }}
+                container.appendChild(table);
+            }}
+
+            // Render the employee cards and the unassigned tasks of the selection as virtual lists.
+            // A task is assigned when any shift of the date holds it, so dateEmployees are all the
+            // shifts of the date, not only the ones the location and period filters show.
+            function renderContent(employees, tasks, dateEmployees) {{
+                const container = document.getElementById('pageContainer');
+                container.replaceChildren();
+
+                const assignedIds = new Set();
+                for (const employee of dateEmployees) {{
+                    const assigned = taskAssignmentsByEmployee.get(`${{employee.Medewerkers}}-${{employee.Datum}}`) || [];
+                    assigned.forEach(task => assignedIds.add(task.TaskId));
+                }}
+                const openTasks = tasks.filter(task => !assignedIds.has(task.TaskId));
+
+                const employeeColumn = document.createElement('div');
+                employeeColumn.className = 'employee-column';
+                employeeColumn.innerHTML = `<h2>Employees (${{employees.length}})</h2>`;
+                container.appendChild(employeeColumn);
+                // Cards have a fixed height for the virtual list, their task list scrolls inside the card
+                createVirtualList(employeeColumn, employees, 72, function(employee) {{
+                    const key = `${{employee.Medewerkers}}-${{employee.Datum}}`;
+                    const card = document.createElement('div');
+                    card.className = 'employee-card';
+                    card.style.cssText = 'display: flex; flex-direction: column; overflow: hidden; box-sizing: border-box;';
+                    if (employee.CellColor) card.style.backgroundColor = employee.CellColor;
+                    const header = document.createElement('div');
+                    header.className = 'employee-header';
+                    header.textContent = `${{employee.Medewerkers}} (${{employee.Functie}}) ${{employee.Starttijd}}-${{employee.Eindtijd}} ${{employee.Locatie}}`;
+                    card.appendChild(header);
+                    const taskList = document.createElement('div');
+                    taskList.className = 'assigned-tasks';
+                    taskList.style.cssText = 'flex: 1 1 auto; min-height: 0; overflow-y: auto;';
+                    for (const task of taskAssignmentsByEmployee.get(key) || []) {{
+                        const item = document.createElement('span');
+                        item.className = 'assigned-task';
+                        item.textContent = `${{task.TaskName}} ${{task.Time}}`;
+                        const button = document.createElement('button');
+                        button.className = 'task-return-button';
+                        button.textContent = '\u00d7';
+                        button.setAttribute('data-task-id', task.TaskId);
+                        button.setAttribute('data-date', employee.Datum);
+                        button.setAttribute('data-employee', employee.Medewerkers);
+                        item.appendChild(button);
+                        taskList.appendChild(item);
+                    }}
+                    card.appendChild(taskList);
+                    return card;
+                }});
+
+                const taskColumn = document.createElement('div');
+                taskColumn.className = 'task-column';
+                taskColumn.innerHTML = `<h2>Unassigned tasks (${{openTasks.length}})</h2>`;
+                container.appendChild(taskColumn);
+                createVirtualList(taskColumn, openTasks, 32, function(task) {{
+                    const item = document.createElement('div');
+                    item.className = 'task-item';
+                    item.setAttribute('data-task-id', task.TaskId);
+                    if (task.CellColor) item.style.backgroundColor = task.CellColor;
+                    item.textContent = `${{task.Time}} ${{task.TaskName}} (${{task.Function}}) ${{task.Locatie}}`;
+                    return item;
+                }});
+            }}
+
+            // Switch to the timeline of the selected date, or back to the task list
+            function showTimelineView() {{
+                if (currentView === 'timeline') {{
+                    showTasklistView();
+                    return;
+                }}
+                if (document.getElementById('dateFilter').value === 'all') {{
+                    alert('Please select a specific date first');
+                    return;
+                }}
+                currentView = 'timeline';
+                document.getElementById('timelineViewButton').textContent = 'Tasklist-view';
+                updateDisplay();
+            }}
+
+            function showTasklistView() {{
+                currentView = 'list';
+                document.getElementById('timelineViewButton').textContent = 'Timeline-view';
+                updateDisplay();
+            }}
+
+            // Draw the shifts of one date as bars, one block per location. Lanes and times come
+            // from timelineData, so the page only positions the bars.
+            function renderTimeline(date, rows) {{
+                const container = document.getElementById('pageContainer');
+                container.replaceChildren();
+                const laneHeight = 22;
+                const timed = rows.filter(row => timelineData.lanes[row] >= 0);
+                if (date === 'all' || timed.length === 0) {{
+                    container.textContent = 'No shifts to show for this selection.';
+                    return;
+                }}
+
+                // The axis runs over whole hours from the earliest start to the latest (overnight) end
+                let first = Infinity, last = -Infinity;
+                for (const row of timed) {{
+                    first = Math.min(first, timelineData.starts[row]);
+                    last = Math.max(last, timelineData.ends[row]);
+                }}
+                first = Math.floor(first / 60) * 60;
+                last = Math.ceil(last / 60) * 60;
+                const position = minutes => `${{(minutes - first) / (last - first) * 100}}%`;
+
+                const byLocation = new Map();
+                for (const row of timed) {{
+                    const location = scheduleData[row].Locatie || '';
+                    if (!byLocation.has(location)) byLocation.set(location, []);
+                    byLocation.get(location).push(row);
+                }}
+
+                const fragment = document.createDocumentFragment();
+                const axis = document.createElement('div');
+                axis.className = 'timeline-axis';
+                axis.style.cssText = 'position: relative; height: 16px; margin-left: 120px;';
+                for (let minutes = first; minutes <= last; minutes += 60) {{
+                    const tick = document.createElement('span');
+                    tick.style.cssText = `position: absolute; left: ${{position(minutes)}}; font-size: 8pt;`;
+                    tick.textContent = String(Math.floor(minutes / 60) % 24).padStart(2, '0');
+                    axis.appendChild(tick);
+                }}
+                fragment.appendChild(axis);
+
+                for (const location of [...byLocation.keys()].sort()) {{
+                    const lanes = (timelineData.laneCounts[date] || {{}})[location] || 1;
+                    const block = document.createElement('div');
+                    block.className = 'timeline-location';
+                    block.style.cssText = 'display: flex; border-top: 1px solid #ccc;';
+                    const label = document.createElement('div');
+                    label.style.cssText = 'width: 120px; flex: none; font-weight: bold; padding: 2px;';
+                    label.textContent = location || 'No location';
+                    const track = document.createElement('div');
+                    track.style.cssText = `position: relative; flex: 1; height: ${{lanes * laneHeight}}px;`;
+                    for (const row of byLocation.get(location)) {{
+                        const employee = scheduleData[row];
+                        const bar = document.createElement('div');
+                        bar.className = 'timeline-bar';
+                        const start = timelineData.starts[row], end = timelineData.ends[row];
+                        bar.style.cssText = `position: absolute; top: ${{timelineData.lanes[row] * laneHeight}}px; ` +
+                            `left: ${{position(start)}}; width: ${{(end - start) / (last - first) * 100}}%; ` +
+                            `height: ${{laneHeight - 2}}px; overflow: hidden; white-space: nowrap; font-size: 8pt; ` +
+                            `border: 1px solid #888; box-sizing: border-box; background: ${{employee.CellColor || '#dbe9f6'}};`;
+                        bar.textContent = `${{employee.Medewerkers}} ${{employee.Starttijd}}-${{employee.Eindtijd}}`;
+                        const tasks = taskAssignmentsByEmployee.get(`${{employee.Medewerkers}}-${{employee.Datum}}`) || [];
+                        bar.title = [`${{employee.Medewerkers}} (${{employee.Functie}})`, ...tasks.map(task => `${{task.Time}} ${{task.TaskName}}`)].join('\\n');
+                        track.appendChild(bar);
+                    }}
+                    block.appendChild(label);
+                    block.appendChild(track);
+                    fragment.appendChild(block);
+                }}
+                container.appendChild(fragment);
+            }}
+
+            // Function to determine if an employee can perform a task based on function matching.
+            // The CC -> E hierarchy is resolved in Python: each employee function has a bitmask
+            // of the task functions it covers and each task function has a single bit.
+            function canEmployeePerformTask(employeeFunction, taskFunction) {{
+                const employeeMask = eligibilityIndex.employeeMasks[employeeFunction] || 0;
+                const taskBit = eligibilityIndex.taskBits[taskFunction] || 0;
+                return (employeeMask & taskBit) !== 0;
+            }}
+
+            // Apply the server-side allocation to the employees in the current selection
+            function autoAllocateTasks() {{
+                const selectedDate = document.getElementById('dateFilter').value;
+                const selectedLocation = document.getElementById('locationFilter').value;
+                const selectedPeriod = document.getElementById('periodFilter').value;
+                
+                const tasksById = new Map(tasksData.map(task => [task.TaskId, task]));
+                
+                const filteredEmployees = selectEmployees(selectedDate, selectedLocation, selectedPeriod);
+                
+                for (const employee of filteredEmployees) {{
+                    const key = `${{employee.Medewerkers}}-${{employee.Datum}}`;
+                    const taskIds = precomputedAssignments[key];
+                    if (taskIds) {{
+                        taskAssignmentsByEmployee.set(key, taskIds.map(taskId => tasksById.get(taskId)));
+                    }}
+                }}
+                
+                updateDisplay();
+            }}
+
+            // Assignments of every date, one record per shift and task, like assignment_store stores them
+            function currentAssignments() {{
+                const assignments = [];
+                const seen = new Set();
+                for (const employee of scheduleData) {{
+                    const key = `${{employee.Medewerkers}}-${{employee.Datum}}`;
+                    if (seen.has(key)) continue;
+                    seen.add(key);
+                    for (const task of taskAssignmentsByEmployee.get(key) || []) {{
+                        assignments.push({{
+                            Medewerkers: employee.Medewerkers,
+                            Datum: employee.Datum,
+                            TaskId: task.TaskId,
+                            Locatie: employee.Locatie,
+                            Dagdeel: task.Dagdeel,
+                        }});
+                    }}
+                }}
+                return assignments;
+            }}
+
+            // Let the browser download content as a file
+            function downloadFile(content, type, fileName) {{
+                const link = document.createElement('a');
+                link.href = URL.createObjectURL(new Blob([content], {{ type: type }}));
+                link.download = fileName;
+                document.body.appendChild(link);
+                link.click();
+                link.remove();
+                setTimeout(() => URL.revokeObjectURL(link.href), 0);
+            }}
+
+            // Download the assignments of every date as a file the app and cli.py --load-assignments
+            // store, so the next page for this roster starts with them
+            function saveAssignments() {{
+                const saved = {{
+                    format: '{SAVED_ASSIGNMENTS_FORMAT}',
+                    roster: rosterName,
+                    dates: Object.keys(scheduleIndex.Datum || {{}}).sort(),
+                    assignments: currentAssignments(),
+                }};
+                downloadFile(JSON.stringify(saved), 'application/json', `${{rosterName || 'task_allocation'}}.assignments.json`);
+            }}
+
+            // Quote a CSV field the way Python's csv module does
+            function csvField(value) {{
+                const text = value === null || value === undefined ? '' : String(value);
+                return /[",\\r\\n]/.test(text) ? `"${{text.replace(/"/g, '""')}}"` : text;
+            }}
+
+            // Download the flight schedule with the page's current assignees, in the columns of the
+            // flight schedule export of the app and cli.py --export csv
+            function exportFlightSchedule() {{
+                const assignees = new Map();
+                for (const assignment of currentAssignments()) {{
+                    assignees.set(`${{assignment.Datum}}|${{assignment.TaskId}}`, assignment.Medewerkers);
+                }}
+                const lines = [flightScheduleColumns.map(csvField).join(',')];
+                for (const date of Object.keys(scheduleIndex.Datum || {{}}).sort()) {{
+                    for (const row of (tasksIndex.Day || {{}})[scheduleIndex.Day[date]] || []) {{
+                        const task = tasksData[row];
+                        const values = {{ ...task, Datum: date, Medewerkers: assignees.get(`${{date}}|${{task.TaskId}}`) }};
+                        lines.push(flightScheduleColumns.map(column => csvField(values[column])).join(','));
+                    }}
+                }}
+                downloadFile(lines.join('\\r\\n') + '\\r\\n', 'text/csv', `${{rosterName || 'task_allocation'}}.flights.csv`);
+            }}
+
+            // Return one task of an employee's shift to the unassigned tasks
+            function unassignTask(date, taskId, employeeId) {{
+                const key = `${{employeeId}}-${{date}}`;
+                const tasks = (taskAssignmentsByEmployee.get(key) || []).filter(task => task.TaskId !== taskId);
+                if (tasks.length > 0) {{
+                    taskAssignmentsByEmployee.set(key, tasks);
+                }} else {{
+                    taskAssignmentsByEmployee.delete(key);
+                }}
+                updateDisplay();
+            }}
+
+            // Your remaining function implementations go here
+            // Include all the original functions from your script:
+            // - hasTimeConflict
+            // - parseTaskTime
+            // - clearTaskAssignments
+            // - createAssignedTaskElement
+            // - initDragAndDrop
+            // - showIncompatibleFunctionAlert
+            // etc.
+
+            // MODIFIED: Start the app when the page loads
+            window.onload = initializeApp;
+        }})();
+    </script>
+</body>
+</html>
+    """
+    
+    return html_content
+
+# Function to read employees and tasks, re-parsing only the sheets changed since they were stored
+def read_workbook_incremental(file_path, store, workers=None):
+    report_progress('Fingerprinting sheets')
+    with span('fingerprint_sheets') as stage:
+        fingerprints = sheet_fingerprints(file_path)
+        stage.rows = len(fingerprints)
+    
+    with span('read_employee_schedule') as stage:
+        employees_df = store.load(fingerprints['Medewerkers']) if 'Medewerkers' in fingerprints else None
+        if employees_df is None:
+            employees_df = read_employee_schedule(iter_employee_shifts(file_path))
+            store.save(fingerprints['Medewerkers'], employees_df)
+        stage.rows = len(employees_df)
+    
+    # Day fragments hold un-numbered tasks, TaskIds count across the whole week
+    # so they are assigned after the fragments are put back together
+    with span('read_daily_tasks') as stage:
+        fragments = {}
+        for day in TASK_DAYS:
+            fingerprint = fingerprints.get(f'Taken {day}')
+            fragment = store.load(fingerprint) if fingerprint else None
+            if fragment is not None:
+                fragments[day] = fragment
+        
+        changed_days = [day for day in TASK_DAYS if day not in fragments]
+        for day, (tasks, error) in zip(changed_days, parse_task_sheets(file_path, changed_days, workers)):
+            fragments[day] = pd.DataFrame(tasks)
+            if error is not None:
+                logger.warning(f"Error reading {day} tasks: {error}")
+            else:
+                store.save(fingerprints[f'Taken {day}'], fragments[day])
+        
+        tasks_df = merge_day_tasks([fragments[day] for day in TASK_DAYS])
+        stage.rows = len(tasks_df)
+    return employees_df, compact_tasks(sort_tasks(tasks_df))
+
+# Function to get the size in bytes of a workbook file or in-memory buffer
+def source_size(source):
+    if hasattr(source, 'getbuffer'):
+        return source.getbuffer().nbytes
+    return os.path.getsize(source)
+
+# Function to read a workbook from disk or an in-memory buffer and generate its HTML page,
+# task_workers > 1 parses the Taken sheets of streamed or stored workbooks in parallel
+# assignment_store pre-loads the assignments saved for the roster's dates into the page,
+# roster is the name they are stored under, see assignment_store.roster_name
+def process_workbook(file_path, store=None, task_workers=None, assignment_store=None, roster=''):
+    if store is not None:
+        # Only sheets whose contents changed since the last upload are parsed
+        employees_df, tasks_df = read_workbook_incremental(file_path, store, workers=task_workers)
+    elif source_size(file_path) > STREAMING_THRESHOLD_BYTES:
+        # Very large rosters are streamed row by row to keep memory flat
+        with span('read_employee_schedule') as stage:
+            employees_df = read_employee_schedule(iter_employee_shifts(file_path))
+            stage.rows = len(employees_df)
+        with span('read_daily_tasks') as stage:
+            if task_workers:
+                tasks_df = read_daily_tasks(file_path, workers=task_workers)
+            else:
+                tasks_df = read_daily_tasks(iter_daily_tasks(file_path))
+            stage.rows = len(tasks_df)
+    else:
+        # Process the file, loading the workbook only once for both readers
+        report_progress('Loading workbook')
+        with span('load_workbook'):
+            workbook = load_workbook_data(file_path)
+        with span('read_employee_schedule') as stage:
+            employees_df = read_employee_schedule(workbook)
+            stage.rows = len(employees_df)
+        with span('read_daily_tasks') as stage:
+            tasks_df = read_daily_tasks(workbook)
+            stage.rows = len(tasks_df)
+    
+    saved_assignments_df = None
+    if assignment_store is not None and not employees_df.empty:
+        with span('load_assignments') as stage:
+            saved_assignments_df = assignment_store.load(roster, dates=employees_df['Datum'].unique())
+            stage.rows = len(saved_assignments_df)
+    
+    # Generate HTML
+    report_progress('Generating page')
+    with span('generate_html'):
+        html_content = generate_html(employees_df, tasks_df, saved_assignments_df=saved_assignments_df, roster=roster)
+    
+    return employees_df, tasks_df, html_content
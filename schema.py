@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from allocation import FUNCTION_RANKS, employee_function_rank, time_to_minutes
+
+# Repeated labels are stored as categoricals, their strings are only produced
+# again when the page payload is encoded
+EMPLOYEE_CATEGORIES = ['Medewerkers', 'DefaultTask', 'Functie', 'Dag', 'Locatie', 'Dagdeel', 'CellColor']
+TASK_CATEGORIES = ['TaskName', 'Function', 'Time', 'Locatie', 'Day', 'Dagdeel', 'CellColor']
+
+# Shift times are minutes after midnight, overnight ends are not shifted to the next day
+EMPLOYEE_TIME_COLUMNS = ['Starttijd', 'Eindtijd']
+
+# Columns only used server side, left out of the page payload
+DERIVED_COLUMNS = ['FunctionRank']
+
+
+# Function to convert a column of 'HH:MM' strings to minutes, converting each distinct value once
+def minutes_column(series):
+    if pd.api.types.is_integer_dtype(series):
+        return series.astype('Int16')
+    codes, uniques = pd.factorize(series)
+    lookup = np.array([time_to_minutes(value) for value in uniques] + [None], dtype=object)
+    return pd.array(lookup[codes], dtype='Int16')
+
+
+# Function to format minutes after midnight back to 'HH:MM'
+def format_minutes(minutes):
+    if pd.isna(minutes):
+        return None
+    return f"{int(minutes) // 60:02d}:{int(minutes) % 60:02d}"
+
+
+# Function to store the given columns as categoricals, mapping each distinct label once
+def categorize(df, columns):
+    return df.assign(**{
+        column: df[column].astype('category')
+        for column in columns if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype)
+    })
+
+
+# Function to map a categorical column per category, giving a nullable integer column
+def map_categories(series, mapping, dtype='Int8'):
+    values = series.cat.categories.map(mapping).to_numpy(dtype=object)
+    lookup = np.append(values, None)
+    return pd.array(lookup[series.cat.codes.to_numpy()], dtype=dtype)
+
+
+# Function to convert an employee schedule to the compact typed schema
+def compact_employees(df):
+    """Categoricals for the labels, Int16 minutes for Starttijd/Eindtijd,
+    datetime64 for Datum and the function rank (1 = CC ... 9 = E) as FunctionRank"""
+    if df.empty:
+        return df
+    df = categorize(df, EMPLOYEE_CATEGORIES)
+    dates = df['Datum']
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format='%Y-%m-%d')
+    df = df.assign(
+        Datum=dates.astype('datetime64[ns]'),
+        **{column: minutes_column(df[column]) for column in EMPLOYEE_TIME_COLUMNS},
+    )
+    return df.assign(FunctionRank=map_categories(df['Functie'], employee_function_rank))
+
+
+# Function to convert a task list to the compact typed schema
+def compact_tasks(df):
+    """Categoricals for the labels and the task function rank (1 = CC ... 9 = E) as FunctionRank"""
+    if df.empty:
+        return df
+    df = categorize(df, TASK_CATEGORIES)
+    return df.assign(FunctionRank=map_categories(df['Function'], FUNCTION_RANKS))
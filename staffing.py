@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+from allocation import FUNCTION_CODES, MINUTES_PER_DAY, TASK_DAYS
+from validation import shift_week_minutes, task_window_arrays
+
+DEFAULT_SLOT_MINUTES = 15
+
+# Location bucket of the tasks without a Locatie, any location can take them
+ANY_LOCATION = ''
+
+
+# Headcount and task demand per date, time slot, location and function rank
+class StaffingGrid:
+    """supply and demand are int32 arrays shaped (date, slot, location, rank).
+
+    supply counts the non-trainee shifts running in a slot by the employee's
+    function rank, demand the tasks running in it by the task's function
+    rank. Shifts and tasks past midnight (overnight ends, night shifts and
+    tasks) count in the slots of the next date. Locations holds ANY_LOCATION
+    for the tasks without one, ranks are the FUNCTION_CODES.
+    """
+
+    def __init__(self, dates, slot_minutes, locations, supply, demand):
+        self.dates = dates
+        self.slot_minutes = slot_minutes
+        self.locations = locations
+        self.ranks = FUNCTION_CODES
+        self.supply = supply
+        self.demand = demand
+
+    @property
+    def slot_labels(self):
+        return [f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(0, MINUTES_PER_DAY, self.slot_minutes)]
+
+    def coverage(self):
+        """Staff able to do the tasks of each rank minus the tasks needing at least that rank.
+
+        An employee covers their own rank and every rank below it, so the
+        supply and demand are accumulated from the most senior rank down;
+        a negative value means tasks of that rank or above go unstaffed.
+        """
+        return np.cumsum(self.supply, axis=3, dtype=np.int32) - np.cumsum(self.demand, axis=3, dtype=np.int32)
+
+    def totals(self, location=None):
+        """Return (supply, demand) shaped (date, slot) over every rank, for one location or all of them"""
+        supply = self.supply.sum(axis=3)
+        demand = self.demand.sum(axis=3)
+        if location is None:
+            return supply.sum(axis=2), demand.sum(axis=2)
+        position = self.locations.index(location)
+        return supply[:, :, position], demand[:, :, position]
+
+    def frame(self, location=None, rank=None):
+        """Long DataFrame of Datum, Slot, Supply, Demand and Gap for a heatmap.
+
+        With a rank, Supply and Demand are the accumulated values of coverage(),
+        otherwise the totals over every rank.
+        """
+        if rank is None:
+            supply, demand = self.totals(location)
+        else:
+            position = self.ranks.index(rank)
+            supply = np.cumsum(self.supply, axis=3)[:, :, :, position]
+            demand = np.cumsum(self.demand, axis=3)[:, :, :, position]
+            if location is None:
+                supply, demand = supply.sum(axis=2), demand.sum(axis=2)
+            else:
+                location_position = self.locations.index(location)
+                supply, demand = supply[:, :, location_position], demand[:, :, location_position]
+        slots = len(self.slot_labels)
+        return pd.DataFrame({
+            'Datum': np.repeat(self.dates, slots),
+            'Slot': np.tile(self.slot_labels, len(self.dates)),
+            'Supply': supply.ravel(),
+            'Demand': demand.ravel(),
+            'Gap': (supply - demand).ravel(),
+        })
+
+
+# Function to add the [start, end) minute intervals of every item to a slot difference array
+def accumulate_intervals(shape, slot_minutes, starts, ends, locations, ranks):
+    """Return int32 counts shaped (location, rank, slot) of the items running in each slot.
+
+    Each interval adds one at its first slot and removes it after its last
+    one, a cumulative sum over the slots then gives the running counts.
+    """
+    locations_count, ranks_count, slots = shape
+    differences = np.zeros((locations_count, ranks_count, slots + 1), dtype=np.int32)
+    first = starts // slot_minutes
+    # A slot counts when the interval covers any part of it
+    last = -(-ends // slot_minutes)
+    keep = (last > first) & (first >= 0) & (ranks >= 0)
+    first, last, locations, ranks = first[keep], np.minimum(last[keep], slots), locations[keep], ranks[keep]
+    np.add.at(differences, (locations, ranks, first), 1)
+    np.add.at(differences, (locations, ranks, last), -1)
+    return np.cumsum(differences[:, :, :slots], axis=2, dtype=np.int32)
+
+
+# Function to build the staffing grid of a roster
+def build_staffing_grid(employees_df, tasks_df, slot_minutes=DEFAULT_SLOT_MINUTES):
+    """Bin the shifts and the task windows of every date into slot_minutes slots.
+
+    Both frames use the compact schema of schema.py. Every Taken sheet
+    applies to each date falling on its weekday, like the allocation.
+    """
+    if employees_df.empty:
+        return StaffingGrid([], slot_minutes, [], np.zeros((0, 0, 0, 0), np.int32), np.zeros((0, 0, 0, 0), np.int32))
+
+    first_date = employees_df['Datum'].min()
+    dates = pd.date_range(first_date, employees_df['Datum'].max(), freq='D')
+    slots_per_day = MINUTES_PER_DAY // slot_minutes
+    # One extra day holds the overnight ends of the last date, it is dropped at the end
+    slots = (len(dates) + 1) * slots_per_day
+
+    shift_locations = employees_df['Locatie'].astype(object).fillna(ANY_LOCATION)
+    task_locations = (
+        tasks_df['Locatie'].astype(object).fillna(ANY_LOCATION) if not tasks_df.empty else pd.Series([], dtype=object)
+    )
+    locations = sorted(set(shift_locations) | set(task_locations))
+    location_codes = {location: code for code, location in enumerate(locations)}
+    shape = (len(locations), len(FUNCTION_CODES), slots)
+
+    shifts = employees_df[~employees_df['IsTrainee'].astype(bool)]
+    shift_starts, shift_ends = shift_week_minutes(shifts, first_date)
+    timed = ~np.isnan(shift_starts) & ~np.isnan(shift_ends)
+    supply = accumulate_intervals(
+        shape, slot_minutes,
+        shift_starts[timed].astype(np.int64), shift_ends[timed].astype(np.int64),
+        shift_locations.loc[shifts.index].map(location_codes).to_numpy()[timed],
+        shifts['FunctionRank'].fillna(0).to_numpy(dtype=np.int64)[timed] - 1,
+    )
+
+    demand = np.zeros(shape, dtype=np.int32)
+    if not tasks_df.empty:
+        tasks = tasks_df.assign(Locatie=task_locations.map(location_codes)).reset_index(drop=True)
+        task_starts, task_ends = task_window_arrays(tasks['Time'])
+        timed_tasks = tasks.assign(Start=task_starts, End=task_ends, Rank=tasks['FunctionRank'].fillna(0).astype(int) - 1)
+        timed_tasks = timed_tasks.loc[task_starts >= 0, ['Day', 'Locatie', 'Rank', 'Start', 'End']].astype({'Day': object})
+        # Every task of a weekday repeats on each date of that weekday
+        days = pd.DataFrame({'Offset': np.arange(len(dates)) * MINUTES_PER_DAY})
+        days['Day'] = [TASK_DAYS[date.dayofweek] for date in dates]
+        needed = days.merge(timed_tasks, on='Day')
+        demand = accumulate_intervals(
+            shape, slot_minutes,
+            (needed['Offset'] + needed['Start']).to_numpy(np.int64), (needed['Offset'] + needed['End']).to_numpy(np.int64),
+            needed['Locatie'].to_numpy(np.int64), needed['Rank'].to_numpy(np.int64),
+        )
+
+    # (location, rank, slot) -> (date, slot, location, rank), without the spill-over day
+    def by_date(counts):
+        counts = counts[:, :, :len(dates) * slots_per_day].reshape(len(locations), len(FUNCTION_CODES), len(dates), slots_per_day)
+        return np.ascontiguousarray(counts.transpose(2, 3, 0, 1))
+
+    return StaffingGrid(
+        [date.strftime('%Y-%m-%d') for date in dates], slot_minutes, locations, by_date(supply), by_date(demand)
+    )
+
+
+# Function to encode the per-location headcount and demand over every rank for the generated page
+def staffing_payload(grid):
+    """supply and demand hold one list per location, date-major: index = date * slots + slot"""
+    locations = len(grid.locations)
+    supply = grid.supply.sum(axis=3, dtype=np.int32).transpose(2, 0, 1).reshape(locations, -1)
+    demand = grid.demand.sum(axis=3, dtype=np.int32).transpose(2, 0, 1).reshape(locations, -1)
+    return {
+        'dates': grid.dates,
+        'slotMinutes': grid.slot_minutes,
+        'locations': grid.locations,
+        'supply': supply.tolist(),
+        'demand': demand.tolist(),
+    }
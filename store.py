@@ -0,0 +1,163 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+
+import pandas as pd
+
+# Bump when the readers change what they produce, so stored fragments are parsed again
+FRAGMENT_VERSION = '2'
+
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'task-allocation-app', 'sheets')
+
+SPREADSHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+RELATIONSHIP_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE_RELATIONSHIP_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+SHEET_DATA = re.compile(rb'<(?:\w+:)?sheetData\b.*?</(?:\w+:)?sheetData>|<(?:\w+:)?sheetData\b[^>]*/>', re.S)
+SHARED_STRING_REF = re.compile(rb'(<(?:\w+:)?c\b[^>]*\bt="s"[^>]*>\s*<(?:\w+:)?v>)(\d+)(</)')
+STYLE_REF = re.compile(rb'(<(?:\w+:)?c\b[^>]*?\ss=")(\d+)(")')
+
+
+# Function to map every sheet name to its worksheet part inside the xlsx archive
+def sheet_parts(archive):
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    relationships = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    targets = {
+        relationship.get('Id'): relationship.get('Target')
+        for relationship in relationships.iter(f'{PACKAGE_RELATIONSHIP_NS}Relationship')
+    }
+
+    parts = {}
+    for sheet in workbook.iter(f'{SPREADSHEET_NS}sheet'):
+        target = targets.get(sheet.get(f'{RELATIONSHIP_NS}id'))
+        if target:
+            # Targets are relative to xl/ unless they start at the package root
+            parts[sheet.get('name')] = target.lstrip('/') if target.startswith('/') else posixpath.join('xl', target)
+    return parts
+
+
+# Function to read the shared strings table as a list of strings
+def shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    table = ET.fromstring(archive.read('xl/sharedStrings.xml'))
+    return [''.join(item.itertext()) for item in table.iter(f'{SPREADSHEET_NS}si')]
+
+
+# Function to describe every cell style by a digest of its format, fill and number format
+def cell_styles(archive):
+    if 'xl/styles.xml' not in archive.namelist():
+        return []
+    stylesheet = ET.fromstring(archive.read('xl/styles.xml'))
+    fills = [ET.tostring(fill) for fill in stylesheet.iterfind(f'{SPREADSHEET_NS}fills/{SPREADSHEET_NS}fill')]
+    number_formats = {
+        number_format.get('numFmtId'): number_format.get('formatCode', '').encode()
+        for number_format in stylesheet.iterfind(f'{SPREADSHEET_NS}numFmts/{SPREADSHEET_NS}numFmt')
+    }
+
+    styles = []
+    for xf in stylesheet.iterfind(f'{SPREADSHEET_NS}cellXfs/{SPREADSHEET_NS}xf'):
+        fill_id = int(xf.get('fillId', 0))
+        fill = fills[fill_id] if fill_id < len(fills) else b''
+        description = ET.tostring(xf) + fill + number_formats.get(xf.get('numFmtId'), b'')
+        styles.append(hashlib.sha256(description).hexdigest().encode())
+    return styles
+
+
+# Function to look up a shared table entry by its index as found in the sheet XML
+def resolve(table, index, default=''):
+    index = int(index)
+    return table[index] if index < len(table) else default
+
+
+# Function to fingerprint the contents of every sheet without loading the workbook
+def sheet_fingerprints(source):
+    """Return {sheet name: fingerprint} for the sheets of an xlsx file or buffer.
+
+    A fingerprint covers the cell data of the sheet with every shared string
+    index and style index replaced by what it refers to. Saving the workbook
+    renumbers those shared tables, so hashing the indices themselves would
+    change the fingerprint of every sheet after editing just one of them.
+    """
+    with zipfile.ZipFile(source) as archive:
+        strings = shared_strings(archive)
+        styles = cell_styles(archive)
+        workbook_properties = ET.fromstring(archive.read('xl/workbook.xml')).find(f'{SPREADSHEET_NS}workbookPr')
+        date_system = workbook_properties.get('date1904', '') if workbook_properties is not None else ''
+
+        fingerprints = {}
+        for name, part in sheet_parts(archive).items():
+            if part not in archive.namelist():
+                continue
+            # Only the cell data matters, not views, selections or column widths
+            sheet_data = SHEET_DATA.search(archive.read(part))
+            sheet_data = sheet_data.group(0) if sheet_data else b''
+            sheet_data = SHARED_STRING_REF.sub(
+                lambda match: match.group(1) + resolve(strings, match.group(2)).encode() + match.group(3), sheet_data
+            )
+            sheet_data = STYLE_REF.sub(
+                lambda match: match.group(1) + resolve(styles, match.group(2), b'') + match.group(3), sheet_data
+            )
+
+            digest = hashlib.sha256()
+            digest.update(f'{FRAGMENT_VERSION}\0{name}\0{date_system}\0'.encode())
+            digest.update(sheet_data)
+            fingerprints[name] = digest.hexdigest()
+
+    return fingerprints
+
+
+# Parsed sheet fragments stored as Parquet files named after their fingerprint
+class SheetStore:
+    def __init__(self, directory=DEFAULT_STORE_DIR, max_fragments=500):
+        self.directory = directory
+        self.max_fragments = max_fragments
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, fingerprint):
+        return os.path.join(self.directory, f'{fingerprint}.parquet')
+
+    def load(self, fingerprint):
+        """Return the stored DataFrame for fingerprint, or None when it is not stored"""
+        path = self.path(fingerprint)
+        if not os.path.exists(path):
+            return None
+        try:
+            fragment = pd.read_parquet(path)
+        except Exception:
+            # A damaged fragment is parsed again and overwritten
+            return None
+        # Refresh the modification time so pruning drops the least recently used fragments
+        os.utime(path)
+        return fragment
+
+    def save(self, fingerprint, fragment):
+        # Write to a temporary file of its own first, so concurrent readers never see a partial file
+        # and threads saving the same fragment never share one
+        descriptor, temp_path = tempfile.mkstemp(prefix=f'{fingerprint}.', suffix='.tmp', dir=self.directory)
+        os.close(descriptor)
+        try:
+            fragment.to_parquet(temp_path)
+            os.replace(temp_path, self.path(fingerprint))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self.prune()
+
+    def prune(self):
+        fragments = [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory) if name.endswith('.parquet')
+        ]
+        if len(fragments) <= self.max_fragments:
+            return
+        fragments.sort(key=os.path.getmtime)
+        for path in fragments[:len(fragments) - self.max_fragments]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
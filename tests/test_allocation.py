@@ -0,0 +1,90 @@
+import datetime
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from allocation import allocate_tasks, repair_allocation
+from benchmarks.synthetic import write_workbook
+from processing import read_daily_tasks, read_employee_schedule
+from validation import validate_allocation
+
+CHECKED_KINDS = ['double_booked', 'outside_shift', 'ineligible', 'location_mismatch']
+
+
+# Task every function can take, put first on Monday and repeated on Tuesday and Wednesday
+REPEATED_TASK = ['Laden\nVlucht KL123', 'E', datetime.time(10, 0), datetime.time(11, 0), 'KL123', None]
+REPEATED_TASK_KEY = 'Laden_10:00_11:00_Ochtend'
+
+
+# Function to add a task whose TaskKey repeats during the week
+def repeat_task(path):
+    wb = openpyxl.load_workbook(path)
+    wb['Taken Maandag'].insert_rows(2)
+    for column, value in enumerate(REPEATED_TASK, start=1):
+        wb['Taken Maandag'].cell(row=2, column=column, value=value)
+    for day in ['Dinsdag', 'Woensdag']:
+        wb[f'Taken {day}'].append(REPEATED_TASK)
+    wb.save(path)
+
+
+@pytest.fixture(scope='module')
+def roster(tmp_path_factory):
+    path = tmp_path_factory.mktemp('roster') / 'roster.xlsx'
+    write_workbook(path, employees=60, days=7, tasks_per_day=40, seed=4)
+    repeat_task(path)
+    employees_df = read_employee_schedule(path)
+    tasks_df = read_daily_tasks(path)
+    return path, employees_df, tasks_df, allocate_tasks(employees_df, tasks_df)
+
+
+# Function to delete the repeated Monday task, which renumbers its later repeats, and re-time a Thursday task
+def change_tasks(path, changed_path):
+    wb = openpyxl.load_workbook(path)
+    wb['Taken Maandag'].delete_rows(2)
+    start_cell, end_cell = wb['Taken Donderdag'][3][2:4]
+    start_cell.value = datetime.time((start_cell.value.hour + 1) % 24, start_cell.value.minute)
+    end_cell.value = datetime.time((end_cell.value.hour + 1) % 24, end_cell.value.minute)
+    wb.save(changed_path)
+    return read_daily_tasks(changed_path)
+
+
+def test_repair_follows_renumbered_tasks(roster, tmp_path):
+    path, employees_df, previous_tasks_df, assignments_df = roster
+    tasks_df = change_tasks(path, tmp_path / 'changed.xlsx')
+    # The repeats of the deleted task moved down one TaskId, and the shifts holding them must follow
+    assert f'{REPEATED_TASK_KEY}_2' not in set(tasks_df['TaskId'])
+    assert assignments_df['TaskId'].isin([f'{REPEATED_TASK_KEY}_1', f'{REPEATED_TASK_KEY}_2']).sum() == 2
+
+    repaired_df, dates = repair_allocation(assignments_df, employees_df, tasks_df, previous_tasks_df=previous_tasks_df)
+
+    assert repaired_df['TaskId'].isin(tasks_df['TaskId']).all()
+    assert not repaired_df.duplicated(['Datum', 'TaskId']).any()
+    # Rows on the dates the change does not touch are kept as they were
+    untouched = ~assignments_df['Datum'].isin(dates)
+    assert untouched.any()
+    pd.testing.assert_frame_equal(
+        repaired_df[~repaired_df['Datum'].isin(dates)].reset_index(drop=True),
+        assignments_df[untouched].reset_index(drop=True),
+    )
+
+    held = repaired_df[repaired_df['TaskId'].str.startswith(REPEATED_TASK_KEY)]
+    assert sorted(held['TaskId']) == [f'{REPEATED_TASK_KEY}_0', f'{REPEATED_TASK_KEY}_1']
+    assert sorted(held['Datum'].dt.dayofweek) == [1, 2]
+
+    # The repair is as valid as allocating the changed roster from scratch
+    expected = validate_allocation(employees_df, tasks_df, allocate_tasks(employees_df, tasks_df))
+    report = validate_allocation(employees_df, tasks_df, repaired_df)
+    for kind in CHECKED_KINDS:
+        assert len(report[kind]) <= len(expected[kind]), kind
+
+
+def test_repair_drops_unknown_tasks(roster):
+    _, employees_df, tasks_df, assignments_df = roster
+    assignments_df = assignments_df.copy()
+    assignments_df.loc[assignments_df.index[0], 'TaskId'] = 'Vervallen_06:00_07:00_Ochtend_0'
+
+    repaired_df, dates = repair_allocation(assignments_df, employees_df, tasks_df)
+
+    assert repaired_df['TaskId'].isin(tasks_df['TaskId']).all()
+    assert dates == [pd.Timestamp(assignments_df['Datum'].iloc[0])]
@@ -0,0 +1,56 @@
+import io
+
+import pandas as pd
+import pytest
+
+import processing
+from allocation import MINUTES_PER_DAY, task_window
+from benchmarks.synthetic import write_workbook
+from processing import process_workbook, read_daily_tasks, read_employee_schedule
+
+
+@pytest.fixture(scope='module')
+def workbook_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp('roster') / 'roster.xlsx'
+    write_workbook(path, employees=30, days=7, tasks_per_day=25, seed=5)
+    return path
+
+
+# Function to read a workbook file into an in-memory upload buffer
+def upload(path):
+    return io.BytesIO(path.read_bytes())
+
+
+def test_employee_schedule_from_bytes(workbook_path):
+    expected = read_employee_schedule(workbook_path)
+    pd.testing.assert_frame_equal(read_employee_schedule(upload(workbook_path)), expected)
+    assert not expected.empty
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_daily_tasks_from_bytes(workbook_path, workers):
+    expected = read_daily_tasks(workbook_path)
+    pd.testing.assert_frame_equal(read_daily_tasks(upload(workbook_path), workers=workers), expected)
+    assert not expected.empty
+
+
+@pytest.mark.parametrize('task_workers', [None, 2])
+def test_streamed_upload_from_bytes(workbook_path, monkeypatch, task_workers):
+    expected_employees, expected_tasks, _ = process_workbook(upload(workbook_path))
+    # Every upload is above the threshold, so it is read with the streaming readers
+    monkeypatch.setattr(processing, 'STREAMING_THRESHOLD_BYTES', 0)
+    employees_df, tasks_df, html_content = process_workbook(upload(workbook_path), task_workers=task_workers)
+    pd.testing.assert_frame_equal(employees_df, expected_employees)
+    pd.testing.assert_frame_equal(tasks_df, expected_tasks)
+    assert 'scheduleData' in html_content
+
+
+@pytest.mark.parametrize('start_time, period', [
+    ('00:00', 'Nacht'), ('04:59', 'Nacht'), ('05:00', 'Ochtend'), ('13:59', 'Ochtend'),
+    ('14:00', 'Avond'), ('21:59', 'Avond'), ('22:00', 'Nacht'),
+])
+def test_night_period_ends_at_day_start(start_time, period):
+    assert processing.determine_period(start_time) == period
+    # Tasks the allocation moves to the night of their day are exactly the early Nacht ones
+    moved = task_window(f'{start_time} - 23:59')[0] >= MINUTES_PER_DAY
+    assert moved == (period == 'Nacht' and start_time < '05:00')
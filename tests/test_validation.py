@@ -0,0 +1,179 @@
+import random
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+from allocation import (
+    MINUTES_PER_DAY,
+    allocate_tasks,
+    function_capability_mask,
+    shift_window,
+    task_function_bit,
+    task_window,
+)
+from benchmarks.synthetic import write_workbook
+from processing import read_daily_tasks, read_employee_schedule
+from validation import validate_allocation
+from workbook import load_workbook_data
+
+
+@pytest.fixture(scope='module')
+def roster(tmp_path_factory):
+    path = tmp_path_factory.mktemp('roster') / 'roster.xlsx'
+    write_workbook(path, employees=60, days=10, tasks_per_day=60, seed=3, overnight_ratio=0.3)
+    workbook = load_workbook_data(path)
+    employees_df = read_employee_schedule(workbook)
+    tasks_df = read_daily_tasks(workbook)
+    return employees_df, tasks_df, allocate_tasks(employees_df, tasks_df)
+
+
+# Function to break a roster: duplicate shifts with other times and hand tasks to random employees and dates
+def broken_roster(employees_df, assignments_df, seed):
+    rng = random.Random(seed)
+    duplicates = employees_df.sample(15, random_state=seed).copy()
+    duplicates['Starttijd'] = [rng.choice([120, 360, 600, 1200]) for _ in range(len(duplicates))]
+    duplicates['Eindtijd'] = [rng.choice([300, 840, 1080, 1380]) for _ in range(len(duplicates))]
+    employees_df = pd.concat([employees_df, duplicates, duplicates.iloc[:3]], ignore_index=True)
+
+    assignments_df = assignments_df.copy()
+    moved = assignments_df.sample(frac=0.3, random_state=seed).index
+    assignments_df['Medewerkers'] = assignments_df['Medewerkers'].astype(object)
+    assignments_df.loc[moved, 'Medewerkers'] = employees_df['Medewerkers'].sample(
+        len(moved), replace=True, random_state=seed
+    ).to_numpy()
+    shifted = moved[:len(moved) // 3]
+    assignments_df.loc[shifted, 'Datum'] = assignments_df.loc[shifted, 'Datum'] + pd.Timedelta(days=1)
+    removed = assignments_df.sample(5, random_state=seed + 1).index
+    assignments_df.loc[removed, 'TaskId'] = [f'Vervallen_06:00_07:00_Ochtend_{number}' for number in range(len(removed))]
+    return employees_df, assignments_df
+
+
+# Function to find, pair by pair, the intervals overlapping an interval that sorts before them
+def brute_overlaps(intervals):
+    found = Counter()
+    for position, (group, start, end, key) in enumerate(intervals):
+        overlaps = [
+            min(end, other_end) - start
+            for other_position, (other_group, other_start, other_end, _) in enumerate(intervals)
+            if other_group == group and (other_start, other_position) < (start, position) and start < other_end
+        ]
+        if overlaps:
+            found[(*key, max(overlaps))] += 1
+    return found
+
+
+# Function to validate the assignments one by one against every shift and task with the scalar helpers
+def brute_force_report(employees_df, tasks_df, assignments_df):
+    week_start = employees_df['Datum'].min() - pd.Timedelta(days=employees_df['Datum'].min().dayofweek)
+
+    def offset(date):
+        return (pd.Timestamp(date) - week_start).days * MINUTES_PER_DAY
+
+    shifts = []
+    for shift in employees_df.itertuples(index=False):
+        window = shift_window(shift.Starttijd, shift.Eindtijd)
+        if window is not None:
+            window = (offset(shift.Datum) + window[0], offset(shift.Datum) + window[1])
+        shifts.append((shift, window))
+    tasks = {task.TaskId: task for task in tasks_df.itertuples(index=False)}
+
+    report = {'overlapping_shifts': brute_overlaps([
+        (shift.Medewerkers, window[0], window[1], (shift.Medewerkers, pd.Timestamp(shift.Datum)))
+        for shift, window in shifts if window is not None
+    ])}
+
+    assignments = []
+    for assignment in assignments_df.itertuples(index=False):
+        task = tasks.get(assignment.TaskId)
+        window = task_window(task.Time) if task is not None else None
+        if window is not None:
+            window = (offset(assignment.Datum) + window[0], offset(assignment.Datum) + window[1])
+        assignments.append((assignment, task, window))
+    report['double_booked'] = brute_overlaps([
+        (assignment.Medewerkers, window[0], window[1],
+         (assignment.Medewerkers, pd.Timestamp(assignment.Datum), assignment.TaskId))
+        for assignment, _, window in assignments if window is not None
+    ])
+
+    for kind in ['outside_shift', 'ineligible', 'location_mismatch', 'unknown_task']:
+        report[kind] = Counter()
+    for assignment, task, window in assignments:
+        key = (assignment.Medewerkers, pd.Timestamp(assignment.Datum), assignment.TaskId)
+        if task is None:
+            report['unknown_task'][key] += 1
+            continue
+        candidates = [
+            (shift, window_) for shift, window_ in shifts
+            if shift.Medewerkers == assignment.Medewerkers
+            and pd.Timestamp(shift.Datum) == pd.Timestamp(assignment.Datum)
+        ]
+        if not candidates:
+            report['outside_shift'][(*key, 'no shift')] += 1
+            continue
+        holding = [
+            candidate for candidate in candidates
+            if window is not None and candidate[1] is not None
+            and candidate[1][0] <= window[0] and window[1] <= candidate[1][1]
+        ]
+        if window is not None and not holding:
+            report['outside_shift'][(*key, 'outside shift window')] += 1
+        shift = (holding or candidates)[0][0]
+        if not function_capability_mask(shift.Functie) & task_function_bit(task.Function):
+            report['ineligible'][key] += 1
+        if isinstance(task.Locatie, str) and task.Locatie and shift.Locatie != task.Locatie:
+            report['location_mismatch'][key] += 1
+    return report
+
+
+# Function to turn the report of validate_allocation into the counters of brute_force_report
+def report_counters(report):
+    def keys(frame, columns):
+        return Counter(
+            tuple(pd.Timestamp(value) if column == 'Datum' else value for column, value in zip(columns, row))
+            for row in frame[columns].itertuples(index=False)
+        )
+
+    return {
+        'overlapping_shifts': keys(report['overlapping_shifts'], ['Medewerkers', 'Datum', 'OverlapMinutes']),
+        'double_booked': keys(report['double_booked'], ['Medewerkers', 'Datum', 'TaskId', 'OverlapMinutes']),
+        'outside_shift': keys(report['outside_shift'], ['Medewerkers', 'Datum', 'TaskId', 'Reason']),
+        'ineligible': keys(report['ineligible'], ['Medewerkers', 'Datum', 'TaskId']),
+        'location_mismatch': keys(report['location_mismatch'], ['Medewerkers', 'Datum', 'TaskId']),
+        'unknown_task': keys(report['unknown_task'], ['Medewerkers', 'Datum', 'TaskId']),
+    }
+
+
+def test_allocation_passes_validation(roster):
+    employees_df, tasks_df, assignments_df = roster
+    report = validate_allocation(employees_df, tasks_df, assignments_df)
+    for kind in ['outside_shift', 'ineligible', 'location_mismatch', 'unknown_task']:
+        assert report[kind].empty, kind
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_validation_matches_brute_force(roster, seed):
+    employees_df, tasks_df, assignments_df = roster
+    employees_df, assignments_df = broken_roster(employees_df, assignments_df, seed)
+
+    report = report_counters(validate_allocation(employees_df, tasks_df, assignments_df))
+    expected = brute_force_report(employees_df, tasks_df, assignments_df)
+
+    for kind, problems in expected.items():
+        assert report[kind] == problems, kind
+    # The broken roster has problems of every kind, so the comparison is not vacuous
+    assert all(expected.values())
+
+
+def test_unknown_tasks_are_reported(roster):
+    employees_df, tasks_df, assignments_df = roster
+    # The first task is removed from the task list after the allocation
+    removed = assignments_df['TaskId'].iloc[0]
+    report = validate_allocation(employees_df, tasks_df[tasks_df['TaskId'] != removed], assignments_df)
+
+    expected = assignments_df.loc[assignments_df['TaskId'] == removed, ['Medewerkers', 'Datum', 'TaskId']]
+    pd.testing.assert_frame_equal(
+        report['unknown_task'].reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False
+    )
+    for kind in ['outside_shift', 'ineligible', 'location_mismatch']:
+        assert report[kind].empty, kind
@@ -0,0 +1,63 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from allocation import MINUTES_PER_DAY
+
+
+# Function to assign every interval of one group a lane, reusing the lane that freed up earliest
+def pack_lanes(starts, ends):
+    """Interval partitioning: intervals come in start order and take the lane
+    that frees up first if it has ended, else open a new one. This uses the
+    fewest lanes possible, the maximum number of overlapping intervals.
+    """
+    lanes = np.empty(len(starts), dtype=np.int32)
+    # (end, lane) of the last interval in every lane
+    ending = []
+    for position, (start, end) in enumerate(zip(starts, ends)):
+        if ending and ending[0][0] <= start:
+            lane = ending[0][1]
+            heapq.heapreplace(ending, (end, lane))
+        else:
+            lane = len(ending)
+            heapq.heappush(ending, (end, lane))
+        lanes[position] = lane
+    return lanes
+
+
+# Function to lay out the shifts of every date and location in timeline lanes
+def timeline_lanes(employees_df):
+    """Return the page's timeline payload for employees_df, row for row.
+
+    starts and ends are minutes after midnight of the shift's date, overnight
+    (+1) ends past 24:00. lanes is the lane of each shift within its date and
+    Locatie, -1 for shifts without times, and laneCounts holds the number of
+    lanes per date and location.
+    """
+    starts = employees_df['Starttijd'].to_numpy(dtype=np.float64, na_value=np.nan)
+    ends = employees_df['Eindtijd'].to_numpy(dtype=np.float64, na_value=np.nan)
+    ends = np.where(ends <= starts, ends + MINUTES_PER_DAY, ends)
+    timed = ~np.isnan(starts) & ~np.isnan(ends)
+
+    date_codes, dates = pd.factorize(employees_df['Datum'])
+    location_codes, locations = pd.factorize(employees_df['Locatie'].astype(object).fillna(''))
+    lanes = np.full(len(employees_df), -1, dtype=np.int32)
+    lane_counts = {}
+
+    rows = np.flatnonzero(timed)
+    # Sort by date, location and start, so every group is one run in start order
+    rows = rows[np.lexsort((starts[rows], location_codes[rows], date_codes[rows]))]
+    groups = date_codes[rows].astype(np.int64) * max(len(locations), 1) + location_codes[rows]
+    boundaries = np.flatnonzero(np.diff(groups)) + 1
+    for group in np.split(rows, boundaries) if len(rows) else []:
+        lanes[group] = pack_lanes(starts[group], ends[group])
+        date = pd.Timestamp(dates[date_codes[group[0]]]).strftime('%Y-%m-%d')
+        lane_counts.setdefault(date, {})[locations[location_codes[group[0]]]] = int(lanes[group].max()) + 1
+
+    return {
+        'starts': np.where(timed, starts, -1).astype(np.int64).tolist(),
+        'ends': np.where(timed, ends, -1).astype(np.int64).tolist(),
+        'lanes': lanes.tolist(),
+        'laneCounts': lane_counts,
+    }
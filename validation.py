@@ -0,0 +1,275 @@
+import numpy as np
+import pandas as pd
+
+from allocation import (
+    DAY_START_MINUTES,
+    FUNCTION_RANKS,
+    MINUTES_PER_DAY,
+    TASK_DAYS,
+    function_capability_mask,
+    task_window,
+)
+
+# Kinds of problems in a validation report, in the order they are reported
+REPORT_KINDS = [
+    'overlapping_shifts',
+    'double_booked',
+    'outside_shift',
+    'ineligible',
+    'location_mismatch',
+    'unknown_task',
+    'uncovered_locations',
+    'unassigned',
+]
+
+
+# Function to map a categorical or string column per distinct value, giving a numpy array
+def map_distinct(series, mapping, dtype, missing):
+    codes, uniques = pd.factorize(series)
+    lookup = np.array([mapping(value) for value in uniques] + [missing], dtype=dtype)
+    return lookup[codes]
+
+
+# Function to get the task windows in minutes after midnight of the task's date, -1 without a time
+def task_window_arrays(times):
+    windows = map_distinct(times, lambda time: task_window(time) or (-1, -1), object, (-1, -1))
+    starts = np.fromiter((window[0] for window in windows), dtype=np.int64, count=len(windows))
+    ends = np.fromiter((window[1] for window in windows), dtype=np.int64, count=len(windows))
+    return starts, ends
+
+
+# Function to get the shift windows in week minutes, moving night shifts and overnight (+1) ends
+# to the next day like allocation.shift_window
+def shift_week_minutes(employees_df, week_start):
+    offsets = (employees_df['Datum'] - week_start).dt.days.to_numpy() * MINUTES_PER_DAY
+    starts = employees_df['Starttijd'].to_numpy(dtype=np.float64, na_value=np.nan)
+    ends = employees_df['Eindtijd'].to_numpy(dtype=np.float64, na_value=np.nan)
+    night = starts < DAY_START_MINUTES
+    starts = np.where(night, starts + MINUTES_PER_DAY, starts)
+    ends = np.where(night, ends + MINUTES_PER_DAY, ends)
+    ends = np.where(ends <= starts, ends + MINUTES_PER_DAY, ends)
+    return offsets + starts, offsets + ends
+
+
+# Function to find intervals overlapping an earlier interval of the same group
+def overlapping_intervals(groups, starts, ends):
+    """Return (rows, earlier rows, overlap minutes) for every interval that starts
+    before an earlier interval of its group has ended.
+
+    The intervals are sorted by group and start. A running maximum of the ends
+    then finds, for every interval, the earlier one of its group that reaches
+    furthest; group codes are folded into the running maximum so it restarts
+    for every group without a Python loop.
+    """
+    if len(starts) < 2:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty
+    order = np.lexsort((starts, groups))
+    groups, starts, ends = groups[order], starts[order], ends[order]
+
+    # key = group, end, position: its running maximum is the furthest reaching interval so far
+    span = int(ends.max() - min(ends.min(), 0)) + 1
+    count = len(order)
+    keys = (groups.astype(np.int64) * span + (ends - min(ends.min(), 0)).astype(np.int64)) * count + np.arange(count)
+    furthest = np.maximum.accumulate(keys)
+    previous = np.concatenate(([-1], furthest[:-1]))
+    previous_position = np.where(previous >= 0, previous % count, 0)
+
+    same_group = (previous >= 0) & (groups[previous_position] == groups)
+    overlap = same_group & (starts < ends[previous_position])
+    rows = np.flatnonzero(overlap)
+    earlier = previous_position[rows]
+    minutes = np.minimum(ends[rows], ends[earlier]) - starts[rows]
+    return order[rows], order[earlier], minutes.astype(np.int64)
+
+
+# Function to validate a whole allocation at once
+def validate_allocation(employees_df, tasks_df, assignments_df):
+    """Check every shift and assignment of the roster and return a report.
+
+    Shifts and tasks are placed on one time axis in minutes from the Monday
+    of the first week, with overnight (+1) shift ends and night shifts and tasks
+    (before 05:00) on the next day, so overlaps across midnight are found too. The
+    report maps each of REPORT_KINDS to a DataFrame of problems:
+
+    overlapping_shifts: an employee has two shifts at the same time
+    double_booked: an employee holds two tasks at the same time
+    outside_shift: a task is assigned outside the assignee's shift window, or without a shift
+    ineligible: the assignee's function rank does not cover the task function
+    location_mismatch: the task location differs from the assignee's shift location
+    unknown_task: an assignment holds a TaskId the task list does not have
+    uncovered_locations: tasks need a location where nobody works that date
+    unassigned: tasks of a date nobody holds
+
+    Both frames use the compact schema of schema.py.
+    """
+    report = {kind: pd.DataFrame() for kind in REPORT_KINDS}
+    if employees_df.empty:
+        return report
+    week_start = employees_df['Datum'].min() - pd.Timedelta(days=employees_df['Datum'].min().dayofweek)
+
+    shifts = employees_df.reset_index(drop=True)
+    shift_starts, shift_ends = shift_week_minutes(shifts, week_start)
+    employee_codes = pd.factorize(shifts['Medewerkers'])[0]
+
+    timed = ~np.isnan(shift_starts) & ~np.isnan(shift_ends)
+    rows, earlier, minutes = overlapping_intervals(
+        employee_codes[timed], shift_starts[timed], shift_ends[timed]
+    )
+    timed_rows = np.flatnonzero(timed)
+    rows, earlier = timed_rows[rows], timed_rows[earlier]
+    report['overlapping_shifts'] = pd.DataFrame({
+        'Medewerkers': shifts['Medewerkers'].to_numpy()[rows],
+        'Datum': shifts['Datum'].to_numpy()[rows],
+        'ConflictDatum': shifts['Datum'].to_numpy()[earlier],
+        'OverlapMinutes': minutes,
+    })
+
+    if tasks_df.empty:
+        if not assignments_df.empty:
+            report['unknown_task'] = assignments_df[['Medewerkers', 'Datum', 'TaskId']].reset_index(drop=True)
+        return report
+    tasks = tasks_df.reset_index(drop=True)
+    task_starts, task_ends = task_window_arrays(tasks['Time'])
+
+    if not assignments_df.empty:
+        report.update(validate_assignments(
+            shifts, shift_starts, shift_ends, tasks, task_starts, task_ends, assignments_df, week_start
+        ))
+    report.update(validate_coverage(shifts, tasks, task_starts, assignments_df))
+    return report
+
+
+# Function to get the row of the assignee's shift for every assignment, -1 without one
+def assignment_shift_rows(shifts, shift_starts, shift_ends, employees, dates, starts, ends):
+    """An employee may have several shifts on a date (the overlapping_shifts
+    problem), so every shift of the assignee on the assignment's date is a
+    candidate. The first one whose window holds the task wins, else the first one.
+    """
+    candidates = pd.DataFrame({
+        'Medewerkers': employees.astype(object).to_numpy(),
+        'Datum': dates.to_numpy(),
+        'Assignment': np.arange(len(employees)),
+    }).merge(
+        pd.DataFrame({
+            'Medewerkers': shifts['Medewerkers'].astype(object).to_numpy(),
+            'Datum': shifts['Datum'].astype('datetime64[ns]').to_numpy(),
+            'Shift': np.arange(len(shifts)),
+        }),
+        on=['Medewerkers', 'Datum'],
+    )
+    assignment = candidates['Assignment'].to_numpy()
+    shift = candidates['Shift'].to_numpy()
+    candidates['Outside'] = ~((starts[assignment] >= shift_starts[shift]) & (ends[assignment] <= shift_ends[shift]))
+    best = candidates.sort_values(['Assignment', 'Outside', 'Shift']).drop_duplicates('Assignment')
+
+    shift_rows = np.full(len(employees), -1, dtype=np.int64)
+    shift_rows[best['Assignment'].to_numpy()] = best['Shift'].to_numpy()
+    return shift_rows
+
+
+# Function to check the assignments against the shifts and tasks they refer to
+def validate_assignments(shifts, shift_starts, shift_ends, tasks, task_starts, task_ends, assignments_df, week_start):
+    assignments = assignments_df.reset_index(drop=True)
+    dates = assignments['Datum'].astype('datetime64[ns]')
+
+    # Row of the task for every assignment, -1 when missing
+    task_rows = pd.Index(tasks['TaskId']).get_indexer(assignments['TaskId'])
+    known = task_rows >= 0
+    timed = known & (task_starts[np.maximum(task_rows, 0)] >= 0)
+
+    offsets = (dates - week_start).dt.days.to_numpy() * MINUTES_PER_DAY
+    starts = np.where(timed, offsets + task_starts[task_rows], np.nan)
+    ends = np.where(timed, offsets + task_ends[task_rows], np.nan)
+
+    shift_rows = assignment_shift_rows(
+        shifts, shift_starts, shift_ends, assignments['Medewerkers'], dates, starts, ends
+    )
+
+    columns = {
+        'Medewerkers': assignments['Medewerkers'].to_numpy(),
+        'Datum': dates.to_numpy(),
+        'TaskId': assignments['TaskId'].to_numpy(),
+    }
+    report = {}
+
+    rows, earlier, minutes = overlapping_intervals(
+        pd.factorize(assignments['Medewerkers'])[0][timed], starts[timed], ends[timed]
+    )
+    timed_rows = np.flatnonzero(timed)
+    rows, earlier = timed_rows[rows], timed_rows[earlier]
+    report['double_booked'] = pd.DataFrame({
+        **{name: values[rows] for name, values in columns.items()},
+        'ConflictTaskId': columns['TaskId'][earlier],
+        'OverlapMinutes': minutes,
+    })
+
+    has_shift = shift_rows >= 0
+    safe_shift = np.maximum(shift_rows, 0)
+    outside = timed & has_shift & ((starts < shift_starts[safe_shift]) | (ends > shift_ends[safe_shift]))
+    missing = known & ~has_shift
+    problem = outside | missing
+    report['outside_shift'] = pd.DataFrame({
+        **{name: values[problem] for name, values in columns.items()},
+        'Reason': np.where(missing[problem], 'no shift', 'outside shift window'),
+    })
+
+    both = known & has_shift
+    safe_task = np.maximum(task_rows, 0)
+    employee_masks = map_distinct(shifts['Functie'], function_capability_mask, np.int64, 0)
+    task_bits = map_distinct(
+        tasks['Function'], lambda function: 1 << (FUNCTION_RANKS[function] - 1) if function in FUNCTION_RANKS else 0,
+        np.int64, 0,
+    )
+    ineligible = both & ((employee_masks[safe_shift] & task_bits[safe_task]) == 0)
+    report['ineligible'] = pd.DataFrame({
+        **{name: values[ineligible] for name, values in columns.items()},
+        'Functie': shifts['Functie'].to_numpy()[safe_shift][ineligible],
+        'Function': tasks['Function'].to_numpy()[safe_task][ineligible],
+    })
+
+    shift_locations = shifts['Locatie'].astype(object).to_numpy()[safe_shift]
+    task_locations = tasks['Locatie'].astype(object).to_numpy()[safe_task]
+    located = both & pd.notna(task_locations) & (task_locations != '')
+    mismatch = located & (shift_locations != task_locations)
+    report['location_mismatch'] = pd.DataFrame({
+        **{name: values[mismatch] for name, values in columns.items()},
+        'Locatie': shift_locations[mismatch],
+        'TaskLocatie': task_locations[mismatch],
+    })
+
+    # Assignments of a task that is not in the task list, e.g. one removed after allocating
+    report['unknown_task'] = pd.DataFrame({name: values[~known] for name, values in columns.items()})
+    return report
+
+
+# Function to find the tasks and task locations of every date that nobody covers
+def validate_coverage(shifts, tasks, task_starts, assignments_df):
+    # Every Taken sheet applies to each date falling on its weekday
+    dates = pd.DataFrame({'Datum': shifts['Datum'].unique()})
+    dates['Day'] = [TASK_DAYS[date.dayofweek] for date in dates['Datum']]
+    timed_tasks = tasks.loc[task_starts >= 0, ['TaskId', 'Day', 'Locatie']].astype({'Day': object})
+    needed = dates.merge(timed_tasks, on='Day')
+
+    if assignments_df.empty:
+        unassigned = needed
+    else:
+        held = pd.MultiIndex.from_arrays([
+            assignments_df['Datum'].astype('datetime64[ns]'), assignments_df['TaskId'].astype(object)
+        ])
+        unassigned = needed[~pd.MultiIndex.from_arrays([needed['Datum'], needed['TaskId']]).isin(held)]
+
+    staffed = pd.MultiIndex.from_arrays([shifts['Datum'], shifts['Locatie'].astype(object)])
+    located = needed[needed['Locatie'].notna() & (needed['Locatie'].astype(object) != '')]
+    uncovered = located[~pd.MultiIndex.from_arrays([located['Datum'], located['Locatie'].astype(object)]).isin(staffed)]
+    return {
+        'uncovered_locations': (
+            uncovered.groupby(['Datum', 'Locatie'], observed=True).size().rename('Tasks').reset_index()
+        ),
+        'unassigned': unassigned[['Datum', 'TaskId', 'Locatie']].reset_index(drop=True),
+    }
+
+
+# Function to count the problems of each kind in a report
+def summarize_report(report):
+    return {kind: len(report[kind]) for kind in REPORT_KINDS}
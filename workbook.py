@@ -0,0 +1,154 @@
+import numpy as np
+import openpyxl
+import pandas as pd
+
+EMPLOYEE_SHEET = 'Medewerkers'
+TASK_DAYS = ['Maandag', 'Dinsdag', 'Woensdag', 'Donderdag', 'Vrijdag', 'Zaterdag', 'Zondag']
+TASK_SHEETS = [f'Taken {day}' for day in TASK_DAYS]
+
+# Fill colour openpyxl reports for a cell without any explicit fill
+DEFAULT_FILL = '00000000'
+
+
+# Values and fill colours of a single worksheet
+class SheetData:
+    def __init__(self, values, fills):
+        self.values = values
+        self.fills = fills
+
+    def fill(self, row, column):
+        """Fill colour of the cell at 1-based (row, column), like sheet.cell(...).fill"""
+        if 1 <= row <= len(self.fills):
+            fill_row = self.fills[row - 1]
+            if 1 <= column <= len(fill_row):
+                return fill_row[column - 1]
+        return DEFAULT_FILL
+
+    def fill_array(self, rows, columns):
+        """Fill colours of the first rows x columns cells as an object array"""
+        grid = np.full((rows, columns), DEFAULT_FILL, dtype=object)
+        for row, fill_row in enumerate(self.fills[:rows]):
+            width = min(len(fill_row), columns)
+            grid[row, :width] = fill_row[:width]
+        return grid
+
+
+# Fill colour of every cell style in a workbook, resolved once instead of per cell
+class StyleTable:
+    """Maps the fill and style ids of a workbook to their fill colours.
+
+    A sheet only uses a few dozen distinct styles, so the colours are
+    resolved and classified once per workbook and cells are looked up by
+    the fill id of their style (the style id for read-only cells) instead
+    of resolving cell.fill.start_color for every cell.
+    """
+
+    def __init__(self, wb):
+        # Gradient fills have no start colour, they read as no fill
+        self.fill_colors = [
+            fill.start_color.rgb if getattr(fill, 'start_color', None) is not None else DEFAULT_FILL
+            for fill in wb._fills
+        ]
+        self.style_colors = [self.fill_color(style.fillId) for style in wb._cell_styles]
+        self.classes = {}
+
+    def fill_color(self, fill_id):
+        return self.fill_colors[fill_id] if fill_id < len(self.fill_colors) else DEFAULT_FILL
+
+    def cell_color(self, cell):
+        """Fill colour of a cell, like cell.fill.start_color.rgb"""
+        style_id = getattr(cell, '_style_id', None)
+        if style_id is not None:
+            # Read-only cells only carry the id of their style
+            return self.style_colors[style_id] if style_id < len(self.style_colors) else DEFAULT_FILL
+        style = getattr(cell, '_style', None)
+        if style is None:
+            # Empty cells of a read-only sheet have no style at all
+            return DEFAULT_FILL
+        return self.fill_color(style.fillId)
+
+    def classify(self, classifier):
+        """Return {fill colour: classifier(colour)} for every colour in the workbook, computed once"""
+        if classifier not in self.classes:
+            colors = set(self.fill_colors) | {DEFAULT_FILL}
+            self.classes[classifier] = {color: classifier(color) for color in colors}
+        return self.classes[classifier]
+
+
+# Every sheet the readers need, parsed from a single workbook load
+class WorkbookData:
+    def __init__(self, sheets, styles=None):
+        self.sheets = sheets
+        self.styles = styles
+
+    def __contains__(self, name):
+        return name in self.sheets
+
+    def __getitem__(self, name):
+        if name not in self.sheets:
+            # Same error openpyxl raises for a missing worksheet
+            raise KeyError(f"Worksheet {name} does not exist.")
+        return self.sheets[name]
+
+
+# Function to collect the fill colour of every cell in one pass over the sheet,
+# max_col limits the columns read when only the first ones are needed
+def read_fill_grid(sheet, styles, max_col=None):
+    return [[styles.cell_color(cell) for cell in row] for row in sheet.iter_rows(max_col=max_col)]
+
+
+# Function to open the workbook once and extract values and fills for every needed sheet
+def load_workbook_data(source):
+    if isinstance(source, WorkbookData):
+        return source
+
+    wb = openpyxl.load_workbook(source, data_only=True)
+    # pandas parses straight from the already loaded workbook instead of reopening the file
+    excel_file = pd.ExcelFile(wb, engine='openpyxl')
+
+    styles = StyleTable(wb)
+    sheets = {}
+    for name in [EMPLOYEE_SHEET] + TASK_SHEETS:
+        if name not in wb.sheetnames:
+            continue
+        # Medewerkers has no header row, the Taken sheets use their first row as header
+        header = None if name == EMPLOYEE_SHEET else 0
+        # Only the fill of the task name in column A is used on the Taken sheets
+        max_col = None if name == EMPLOYEE_SHEET else 1
+        sheets[name] = SheetData(
+            values=excel_file.parse(name, header=header),
+            fills=read_fill_grid(wb[name], styles, max_col=max_col),
+        )
+
+    return WorkbookData(sheets, styles)
+
+
+# Function to open the workbook in read-only mode for row streaming
+def open_streaming_workbook(source):
+    return openpyxl.load_workbook(source, read_only=True, data_only=True)
+
+
+# Function to convert a streamed cell value the same way pandas reads it
+def convert_cell(cell):
+    if cell.value is None or cell.data_type == 'e':
+        return np.nan
+    if cell.data_type == 'n' and not isinstance(cell.value, bool):
+        value = int(cell.value)
+        return value if value == cell.value else float(cell.value)
+    return cell.value
+
+
+# Function to stream one sheet row by row as (values, fills) lists,
+# pass the workbook's StyleTable to share it between sheets
+def iter_sheet_rows(wb, name, styles=None):
+    if name not in wb.sheetnames:
+        raise KeyError(f"Worksheet {name} does not exist.")
+    styles = styles or StyleTable(wb)
+
+    sheet = wb[name]
+    # The stored dimensions can be wrong, so let openpyxl discover them while reading
+    sheet.reset_dimensions()
+    for row in sheet.iter_rows():
+        values = [convert_cell(cell) for cell in row]
+        fills = [styles.cell_color(cell) for cell in row]
+        yield values, fills